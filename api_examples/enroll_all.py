@@ -7,26 +7,32 @@ password = ''
 
 
 base_url = 'http://127.0.0.1:8000/api/'
-url = f'{base_url}courses/'
+# Cursor pagination keeps every page as cheap as the first one.
+url = f'{base_url}courses/?pagination=cursor&page_size=50'
 available_courses = []
+courses = []
 
 while url is not None:
     print(f'Loading courses from {url}')
     r = requests.get(url)
     response = r.json()
     url = response['next']
-    courses = response['results']
-    available_courses += [course['title'] for course in courses]
+    courses += response['results']
+    available_courses += [course['title'] for course in response['results']]
 print(f'Available courses: {", ".join(available_courses)}')
 
 
-for course in courses:
-    course_id = course['id']
-    course_title = course['title']
-    r = requests.post(
-        f'{base_url}courses/{course_id}/enroll/',
-        auth=(username, password),
-    )
-    if r.status_code == 200:
-        # successful request
-        print(f'Successfully enrolled in {course_title}')
\ No newline at end of file
+# One password check to get a token, then one request for every course.
+r = requests.post(
+    f'{base_url}token/',
+    data={'username': username, 'password': password},
+)
+token = r.json()['token']
+r = requests.post(
+    f'{base_url}courses/bulk-enroll/',
+    json={'courses': [course['id'] for course in courses]},
+    headers={'Authorization': f'Token {token}'},
+)
+if r.status_code == 200:
+    # successful request
+    print(f'Successfully enrolled in {r.json()["enrolled"]} new courses')
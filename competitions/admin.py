@@ -1,14 +1,17 @@
 from django.contrib import admin
+from django.db import transaction
 from django.http import HttpResponse
 from django.utils import timezone
 import csv
 
+from . import leaderboard, ranks
 from .models import (
     Competition,
     SchoolCompetitionEntry,
     StudentCompetitionEntry,
     CompetitionScoreEvent,
     CompetitionDisqualification,
+    CompetitionScoreSnapshot,
 )
 
 
@@ -50,45 +53,13 @@ def deactivate_competitions(modeladmin, request, queryset):
 @admin.action(description="Recalculate ranks for selected competitions")
 def recalc_ranks(modeladmin, request, queryset):
     """
-    Dense-rank by score (higher score -> rank 1). Ties share rank.
+    Dense-rank by score (higher score -> rank 1). Ties share rank,
+    disqualified entries get 0. One UPDATE per entry table.
     """
-    total_updated = 0
-    for comp in queryset:
-        # Schools
-        entries = list(
-            SchoolCompetitionEntry.objects.filter(competition=comp)
-            .only("id", "score", "rank")
-            .order_by("-score", "created_at")
-        )
-        rank = 0
-        last_score = None
-        for idx, e in enumerate(entries, start=1):
-            if e.score != last_score:
-                rank += 1
-            last_score = e.score
-            if e.rank != rank:
-                e.rank = rank
-        SchoolCompetitionEntry.objects.bulk_update(entries, ["rank"])
-        total_updated += len(entries)
-
-        # Students
-        sentries = list(
-            StudentCompetitionEntry.objects.filter(competition=comp)
-            .only("id", "score", "rank")
-            .order_by("-score", "created_at")
-        )
-        rank = 0
-        last_score = None
-        for idx, e in enumerate(sentries, start=1):
-            if e.score != last_score:
-                rank += 1
-            last_score = e.score
-            if e.rank != rank:
-                e.rank = rank
-        StudentCompetitionEntry.objects.bulk_update(sentries, ["rank"])
-        total_updated += len(sentries)
-
-    modeladmin.message_user(request, f"Ranks recalculated for {queryset.count()} competitions (entries updated: {total_updated}).")
+    competition_ids = list(queryset.values_list("id", flat=True))
+    total_updated = ranks.recompute(SchoolCompetitionEntry, competition_ids)
+    total_updated += ranks.recompute(StudentCompetitionEntry, competition_ids)
+    modeladmin.message_user(request, f"Ranks recalculated for {len(competition_ids)} competitions (entries updated: {total_updated}).")
 
 
 @admin.action(description="Export school leaderboards (CSV)")
@@ -159,19 +130,35 @@ class CompetitionAdmin(BaseTimestampedAdmin):
     student_count.short_description = "Students"
 
 
+def _update_and_rerank(queryset, **values):
+    """
+    Bulk update entries, then re-rank their competitions. The board locks
+    are taken before the UPDATE, so an incremental re-rank running at the
+    same time never computes from the old rows.
+    """
+    competition_ids = set(queryset.values_list("competition_id", flat=True))
+    with transaction.atomic():
+        ranks.lock_all(queryset.model, competition_ids)
+        queryset.update(**values)
+        ranks.recompute(queryset.model, competition_ids)
+    return competition_ids
+
+
 @admin.action(description="Disqualify selected entries")
 def disqualify_entries(modeladmin, request, queryset):
-    queryset.update(disqualified=True)
+    _update_and_rerank(queryset, disqualified=True)
 
 
 @admin.action(description="Re-qualify selected entries")
 def requalify_entries(modeladmin, request, queryset):
-    queryset.update(disqualified=False)
+    _update_and_rerank(queryset, disqualified=False)
 
 
 @admin.action(description="Reset scores to 0")
 def reset_scores(modeladmin, request, queryset):
-    queryset.update(score=0, rank=0)
+    competition_ids = _update_and_rerank(queryset, score=0)
+    # the bulk UPDATE bypassed the leaderboards, reload them on next read
+    transaction.on_commit(lambda: leaderboard.invalidate(competition_ids))
 
 
 @admin.register(SchoolCompetitionEntry)
@@ -215,6 +202,9 @@ class CompetitionScoreEventAdmin(BaseTimestampedAdmin):
     )
     autocomplete_fields = ("competition", "school", "student", "created_by")
     readonly_fields = ("created_at", "updated_at")
+    # one query per page instead of one per row, and no COUNT(*) of the whole log
+    list_select_related = ("competition", "school", "student__user", "created_by")
+    show_full_result_count = False
 
     def target_display(self, obj):
         if obj.school_id:
@@ -249,3 +239,25 @@ class CompetitionDisqualificationAdmin(BaseTimestampedAdmin):
             return f"Student: {name}"
         return "-"
     target_display.short_description = "Target"
+
+
+@admin.register(CompetitionScoreSnapshot)
+class CompetitionScoreSnapshotAdmin(BaseTimestampedAdmin):
+    list_display = ("competition", "last_event_id", "event_count", "compacted", "archive_name", "created_at")
+    list_filter = ("competition", "compacted")
+    list_select_related = ("competition",)
+    fields = ("competition", "last_event_id", "event_count", "compacted", "archive_name", "created_at", "updated_at")
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        # taken by the snapshot_scores command
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        # compacted events only survive in the snapshot totals
+        return False
+
+    def archive_name(self, obj):
+        # kept in the private storage, which has no URL to link to
+        return obj.archive.name or "-"
+    archive_name.short_description = "Archive"
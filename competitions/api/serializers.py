@@ -0,0 +1,18 @@
+from rest_framework import serializers
+
+from competitions import leaderboard
+from competitions.models import CompetitionScoreEvent
+
+MAX_AWARDS = 10000
+
+
+class ScoreAwardSerializer(serializers.Serializer):
+    kind = serializers.ChoiceField(choices=[leaderboard.SCHOOLS, leaderboard.STUDENTS])
+    entry = serializers.IntegerField(min_value=1)
+    points = serializers.IntegerField(min_value=-leaderboard.MAX_SCORE, max_value=leaderboard.MAX_SCORE)
+    category = serializers.ChoiceField(choices=CompetitionScoreEvent.CATEGORY_CHOICES, default="activity")
+    reason = serializers.CharField(max_length=255, required=False, allow_blank=True, default="")
+
+
+class ScoreBatchSerializer(serializers.Serializer):
+    awards = ScoreAwardSerializer(many=True, allow_empty=False, max_length=MAX_AWARDS)
@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import ScoreBatchAPIView
+
+app_name = "competitions_api"
+urlpatterns = [
+    path("<slug:slug>/scores/", ScoreBatchAPIView.as_view(), name="score_batch"),
+]
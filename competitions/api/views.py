@@ -0,0 +1,34 @@
+from django.core.exceptions import ValidationError
+from django.shortcuts import get_object_or_404
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from competitions.models import Competition
+from competitions.scoring import Award, apply_awards
+from .serializers import ScoreBatchSerializer
+
+
+class ScoreBatchAPIView(APIView):
+    """
+    Award points to many school or student entries of one competition in a
+    single request. Either every award is applied or none is.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request, slug):
+        competition = get_object_or_404(Competition, slug=slug)
+        ser = ScoreBatchSerializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        awards = [
+            Award(a["kind"], a["entry"], a["points"], a["category"], a["reason"])
+            for a in ser.validated_data["awards"]
+        ]
+        try:
+            changed = apply_awards(competition, awards, by=request.user)
+        except ValidationError as exc:
+            if hasattr(exc, "error_dict"):
+                # per-award errors, keyed by position in the batch
+                return Response({"awards": exc.message_dict}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({"detail": exc.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"awards": len(awards), "entries": changed}, status=status.HTTP_200_OK)
@@ -0,0 +1,37 @@
+import json
+
+from channels.generic.websocket import AsyncWebsocketConsumer
+
+from . import live
+from .models import Competition
+
+
+class LeaderboardConsumer(AsyncWebsocketConsumer):
+    """
+    Read-only feed of leaderboard changes for one competition. Frames come
+    from `live.flush()` and list the entries that changed since the last
+    frame with their new score and position.
+    """
+
+    async def connect(self):
+        slug = self.scope["url_route"]["kwargs"]["slug"]
+        self.competition_id = await (
+            Competition.objects.filter(slug=slug).values_list("pk", flat=True).afirst()
+        )
+        if self.competition_id is None:
+            await self.close()
+            return
+        self.group_name = live.group_name(self.competition_id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        if getattr(self, "group_name", None):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        # spectators only listen
+        pass
+
+    async def leaderboard_update(self, event):
+        await self.send(text_data=json.dumps({"entries": event["entries"]}))
@@ -0,0 +1,337 @@
+"""
+Leaderboards mirrored into Redis sorted sets.
+
+Each competition has one sorted set of school entries and one of student
+entries, keyed by entry id. The set score packs the entry score and its
+creation order, so ZREVRANGE returns entries in the same order as
+`ORDER BY -score, created_at`, and top-N pages, the position of an entry and
+the window around it each cost O(log n) instead of a sort in Postgres.
+
+Sets are filled lazily from the database and then kept current by
+`add_points()` (ZINCRBY after commit) and by the save and delete signals.
+`rebuild_leaderboards` repairs them after bulk changes made outside the
+models. Every change is also queued for the live push in `live`.
+"""
+import logging
+from functools import lru_cache
+
+import redis
+from django.conf import settings
+from django.db import transaction
+
+from lenextra.db import use_primary
+
+from . import live
+from .models import SchoolCompetitionEntry, StudentCompetitionEntry
+
+logger = logging.getLogger(__name__)
+
+SCHOOLS = 'schools'
+STUDENTS = 'students'
+ENTRY_MODELS = {
+    SCHOOLS: SchoolCompetitionEntry,
+    STUDENTS: StudentCompetitionEntry,
+}
+# Set scores are doubles: score * 2**ID_BITS + tie-breaker must stay below
+# 2**53, which leaves entry scores of +-2**21 points. Scoring rejects
+# results beyond; scores set by hand beyond are clamped on the board (the
+# database keeps the exact value).
+ID_BITS = 31
+ID_SPAN = 2 ** ID_BITS
+MAX_SCORE = 2 ** (53 - ID_BITS - 1) - 1
+REBUILD_CHUNK = 5000
+REBUILD_LOCK_TIMEOUT = 30
+# A rebuild is retried when scores change while it reads the database.
+REBUILD_ATTEMPTS = 3
+# Boards are re-read from the database at least this often, so an update
+# lost to a Redis outage does not stay on the board for good; a rebuild
+# that kept losing races to scoring is re-read much sooner.
+READY_TIMEOUT = 60 * 60
+CONTENDED_READY_TIMEOUT = 5
+
+
+@lru_cache(maxsize=None)
+def get_client():
+    url = getattr(settings, 'LEADERBOARD_REDIS_URL', None) or settings.CACHES['default']['LOCATION']
+    return redis.Redis.from_url(url)
+
+
+def kind_of(entry):
+    return SCHOOLS if isinstance(entry, SchoolCompetitionEntry) else STUDENTS
+
+
+def clamp(score):
+    return max(-MAX_SCORE, min(score, MAX_SCORE))
+
+
+def encode(score, entry_id):
+    # earlier entries (lower ids) win ties, as with `created_at`
+    return clamp(score) * ID_SPAN + (ID_SPAN - 1 - entry_id)
+
+
+def decode(value):
+    return int(value) // ID_SPAN
+
+
+class Leaderboard:
+    def __init__(self, competition_id, kind):
+        self.competition_id = competition_id
+        self.kind = kind
+        self.model = ENTRY_MODELS[kind]
+        self.key = f'leaderboard:{competition_id}:{kind}'
+        self.ready_key = f'{self.key}:ready'
+        # bumped by every write, so a rebuild can tell it raced with one
+        self.writes_key = f'{self.key}:writes'
+        self.staging_key = f'{self.key}:staging'
+
+    @property
+    def client(self):
+        return get_client()
+
+    def ensure(self):
+        """
+        Fill the set from the database unless it is already current.
+        """
+        if self.client.exists(self.ready_key):
+            return
+        lock = self.client.lock(f'{self.key}:lock', timeout=REBUILD_LOCK_TIMEOUT)
+        with lock:
+            if not self.client.exists(self.ready_key):
+                self.rebuild()
+
+    def rebuild(self):
+        """
+        Replace the set with the scores in the database. The new set is
+        built under a staging key and swapped in with one RENAME, so readers
+        never see it half filled. A write made while the database was read
+        would be lost by the swap; the swap is then abandoned (WATCH on the
+        write counter) and the rebuild starts over.
+        """
+        for _ in range(REBUILD_ATTEMPTS):
+            writes = self.client.get(self.writes_key)
+            total = self._fill_staging()
+            with self.client.pipeline(transaction=True) as pipe:
+                try:
+                    pipe.watch(self.writes_key)
+                    if pipe.get(self.writes_key) != writes:
+                        continue
+                    pipe.multi()
+                    self._swap(pipe, total, READY_TIMEOUT)
+                    pipe.execute()
+                    return total
+                except redis.WatchError:
+                    continue
+        # scoring never paused: install the last build, but re-read soon
+        pipe = self.client.pipeline(transaction=True)
+        self._swap(pipe, total, CONTENDED_READY_TIMEOUT)
+        pipe.execute()
+        return total
+
+    def _fill_staging(self):
+        rows = (
+            self.model.objects.filter(competition_id=self.competition_id)
+            .values_list('pk', 'score')
+            .order_by('pk')
+        )
+        self.client.delete(self.staging_key)
+        batch = {}
+        total = 0
+        with use_primary():
+            for pk, score in rows.iterator(chunk_size=REBUILD_CHUNK):
+                batch[pk] = encode(score, pk)
+                if len(batch) >= REBUILD_CHUNK:
+                    self.client.zadd(self.staging_key, batch)
+                    total += len(batch)
+                    batch = {}
+        if batch:
+            self.client.zadd(self.staging_key, batch)
+            total += len(batch)
+        return total
+
+    def _swap(self, pipe, total, ready_timeout):
+        if total:
+            pipe.rename(self.staging_key, self.key)
+        else:
+            pipe.delete(self.key)
+        pipe.set(self.ready_key, 1, ex=ready_timeout)
+
+    def invalidate(self):
+        self.client.delete(self.ready_key)
+
+    def set(self, entry_id, score):
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zadd(self.key, {entry_id: encode(score, entry_id)})
+        pipe.incr(self.writes_key)
+        pipe.execute()
+
+    def incr(self, entry_id, points):
+        self.incr_many({entry_id: points})
+
+    def incr_many(self, deltas):
+        """
+        Apply {entry_id: points} in one round trip.
+        """
+        pipe = self.client.pipeline(transaction=False)
+        for entry_id, points in deltas.items():
+            pipe.zincrby(self.key, points * ID_SPAN, entry_id)
+        pipe.incr(self.writes_key)
+        pipe.execute()
+
+    def remove(self, entry_id):
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zrem(self.key, entry_id)
+        pipe.incr(self.writes_key)
+        pipe.execute()
+
+    def count(self):
+        self.ensure()
+        return self.client.zcard(self.key)
+
+    def top(self, n, offset=0):
+        """
+        [(entry_id, score)] of the entries ranked offset+1 .. offset+n.
+        """
+        self.ensure()
+        rows = self.client.zrevrange(self.key, offset, offset + n - 1, withscores=True)
+        return [(int(member), decode(value)) for member, value in rows]
+
+    def position(self, entry_id):
+        """
+        1-based place of the entry, or None if it is not on the board.
+        """
+        self.ensure()
+        index = self.client.zrevrank(self.key, entry_id)
+        return None if index is None else index + 1
+
+    def around(self, entry_id, radius=5):
+        """
+        (offset, [(entry_id, score)]) of the entries within `radius` places
+        of `entry_id`.
+        """
+        place = self.position(entry_id)
+        if place is None:
+            return 0, []
+        offset = max(place - 1 - radius, 0)
+        return offset, self.top(place - offset + radius, offset)
+
+    def entries(self, n, offset=0, queryset=None):
+        """
+        Entry rows for `top(n, offset)`, in board order, each with its
+        `position`, loaded with one query from `queryset` (all entries by
+        default).
+        """
+        ranked = self.top(n, offset)
+        if queryset is None:
+            queryset = self.model.objects.all()
+        rows = queryset.in_bulk([entry_id for entry_id, _ in ranked])
+        result = []
+        for place, (entry_id, _) in enumerate(ranked, start=offset + 1):
+            row = rows.get(entry_id)
+            if row is not None:
+                row.position = place
+                result.append(row)
+        return result
+
+
+class LeaderboardPage:
+    """
+    Sequence over a leaderboard for django.core.paginator.Paginator: count()
+    is a ZCARD and slicing fetches one page of rows.
+    """
+
+    def __init__(self, board, queryset=None):
+        self.board = board
+        self.queryset = queryset
+
+    def count(self):
+        return self.board.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        return self.board.entries(index.stop - start, start, self.queryset)
+
+
+def for_entry(entry):
+    return Leaderboard(entry.competition_id, kind_of(entry))
+
+
+def _on_commit(board, apply):
+    """
+    Run `apply` after commit. The score is already committed by then, so a
+    Redis failure must not fail the request: the board is dropped instead and
+    read again from the database once Redis is back.
+    """
+
+    def run():
+        try:
+            apply()
+        except redis.RedisError:
+            logger.exception('Leaderboard update failed for %s', board.key)
+            try:
+                board.invalidate()
+            except redis.RedisError:
+                # READY_TIMEOUT drops the board later
+                pass
+
+    transaction.on_commit(run)
+
+
+def record_points(entry, points):
+    """
+    Apply `points` to the entry's board once the score change commits.
+    """
+    board = for_entry(entry)
+
+    def apply():
+        board.incr(entry.pk, points)
+        live.mark_dirty(board, entry.pk)
+
+    _on_commit(board, apply)
+
+
+def record_batch(competition_id, kind, deltas):
+    """
+    Apply {entry_id: points} to one board once the batch commits.
+    """
+    board = Leaderboard(competition_id, kind)
+
+    def apply():
+        board.incr_many(deltas)
+        live.mark_dirty(board, *deltas)
+
+    _on_commit(board, apply)
+
+
+def record_score(entry):
+    """
+    Put the entry on its board with its current score after commit.
+    """
+    board = for_entry(entry)
+    score = entry.score
+
+    def apply():
+        board.set(entry.pk, score)
+        live.mark_dirty(board, entry.pk)
+
+    _on_commit(board, apply)
+
+
+def record_removal(entry):
+    board = for_entry(entry)
+
+    def apply():
+        board.remove(entry.pk)
+        live.mark_dirty(board, entry.pk)
+
+    _on_commit(board, apply)
+
+
+def invalidate(competition_ids):
+    for competition_id in set(competition_ids):
+        for kind in ENTRY_MODELS:
+            Leaderboard(competition_id, kind).invalidate()
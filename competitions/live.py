@@ -0,0 +1,96 @@
+"""
+Coalesced leaderboard pushes to `LeaderboardConsumer`.
+
+A committed score change only marks its entry dirty in Redis. The first
+change after a flush also takes a short-lived gate key and schedules one
+flush `FLUSH_INTERVAL` later; changes arriving meanwhile join that flush.
+So each competition gets at most 1 / FLUSH_INTERVAL frames per second,
+whichever process the scoring happens in, and each frame carries the latest
+score and position of every entry that changed.
+"""
+import logging
+import threading
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from . import leaderboard
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 0.25
+# Lets a new flush be scheduled if the process holding the gate died.
+GATE_TIMEOUT_MS = 5000
+
+
+def group_name(competition_id):
+    return f"leaderboard_{competition_id}"
+
+
+def _dirty_key(competition_id):
+    return f"leaderboard:{competition_id}:dirty"
+
+
+def _gate_key(competition_id):
+    return f"leaderboard:{competition_id}:push"
+
+
+def mark_dirty(board, *entry_ids):
+    """
+    Queue the entries for the next frame of their competition.
+    """
+    client = leaderboard.get_client()
+    competition_id = board.competition_id
+    client.sadd(_dirty_key(competition_id), *(f"{board.kind}:{entry_id}" for entry_id in entry_ids))
+    if client.set(_gate_key(competition_id), 1, nx=True, px=GATE_TIMEOUT_MS):
+        timer = threading.Timer(FLUSH_INTERVAL, _flush_safely, args=[competition_id])
+        timer.daemon = True
+        timer.start()
+
+
+def _flush_safely(competition_id):
+    try:
+        flush(competition_id)
+    except Exception:
+        logger.exception("Leaderboard push for competition %s failed", competition_id)
+
+
+def flush(competition_id):
+    """
+    Send one frame with every entry that changed since the last one.
+    """
+    client = leaderboard.get_client()
+    # release the gate first: a change from now on schedules the next frame
+    client.delete(_gate_key(competition_id))
+    pipe = client.pipeline(transaction=True)
+    pipe.smembers(_dirty_key(competition_id))
+    pipe.delete(_dirty_key(competition_id))
+    members, _ = pipe.execute()
+    if not members:
+        return
+
+    changed = sorted(member.decode().split(":") for member in members)
+    boards = {}
+    pipe = client.pipeline(transaction=False)
+    for kind, entry_id in changed:
+        board = boards.setdefault(kind, leaderboard.Leaderboard(competition_id, kind))
+        pipe.zscore(board.key, entry_id)
+        pipe.zrevrank(board.key, entry_id)
+    results = pipe.execute()
+
+    entries = []
+    for index, (kind, entry_id) in enumerate(changed):
+        value, rank = results[2 * index], results[2 * index + 1]
+        entries.append(
+            {
+                "kind": kind,
+                "id": int(entry_id),
+                # None when the entry was removed
+                "score": None if value is None else leaderboard.decode(value),
+                "position": None if rank is None else rank + 1,
+            }
+        )
+    async_to_sync(get_channel_layer().group_send)(
+        group_name(competition_id),
+        {"type": "leaderboard_update", "entries": entries},
+    )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from competitions import leaderboard
+from competitions.models import Competition
+
+
+class Command(BaseCommand):
+    help = "Reload the Redis leaderboards of competitions from the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("slugs", nargs="*", help="Competitions to rebuild (default: all active).")
+
+    def handle(self, *args, slugs=(), **options):
+        competitions = Competition.objects.all() if slugs else Competition.objects.filter(is_active=True)
+        if slugs:
+            competitions = competitions.filter(slug__in=slugs)
+        for competition_id in competitions.values_list("pk", flat=True):
+            for kind in leaderboard.ENTRY_MODELS:
+                total = leaderboard.Leaderboard(competition_id, kind).rebuild()
+                self.stdout.write(f"Competition {competition_id} {kind}: {total} entries.")
+        self.stdout.write(self.style.SUCCESS("Leaderboards rebuilt."))
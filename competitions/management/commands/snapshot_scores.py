@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from competitions import snapshots
+from competitions.models import Competition
+
+
+class Command(BaseCommand):
+    help = "Roll score events up into per-competition snapshots, optionally archiving and deleting them."
+
+    def add_arguments(self, parser):
+        parser.add_argument("slugs", nargs="*", help="Competitions to snapshot (default: all).")
+        parser.add_argument(
+            "--older-than", type=int, default=0, metavar="DAYS",
+            help="Only roll up events older than this many days.",
+        )
+        parser.add_argument(
+            "--compact", action="store_true",
+            help="Archive the covered events to compressed files and delete them.",
+        )
+
+    def handle(self, *args, slugs=(), older_than=0, compact=False, **options):
+        competitions = Competition.objects.all()
+        if slugs:
+            competitions = competitions.filter(slug__in=slugs)
+        before = timezone.now() - timedelta(days=older_than) if older_than else None
+        for competition in competitions.order_by("pk"):
+            snapshot = snapshots.take(competition, before=before, compact=compact)
+            if snapshot is None:
+                self.stdout.write(f"{competition.slug}: no events.")
+                continue
+            line = f"{competition.slug}: snapshot at event {snapshot.last_event_id} ({snapshot.event_count} events)"
+            if snapshot.archive:
+                line += f", archived to {snapshot.archive.name}"
+            self.stdout.write(line + ".")
+        self.stdout.write(self.style.SUCCESS("Score snapshots taken."))
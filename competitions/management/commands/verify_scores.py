@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from competitions import snapshots
+from competitions.models import Competition
+
+
+class Command(BaseCommand):
+    help = "Check that every entry score equals its latest snapshot plus the score events after it."
+
+    def add_arguments(self, parser):
+        parser.add_argument("slugs", nargs="*", help="Competitions to verify (default: all).")
+
+    def handle(self, *args, slugs=(), **options):
+        competitions = Competition.objects.all()
+        if slugs:
+            competitions = competitions.filter(slug__in=slugs)
+        failed = 0
+        for competition in competitions.order_by("pk"):
+            for kind, entry, score, expected in snapshots.verify(competition):
+                failed += 1
+                self.stdout.write(
+                    f"{competition.slug} {kind} entry {entry.pk}: score {score}, events say {expected}."
+                )
+        if failed:
+            raise CommandError(f"{failed} entries do not match their score events.")
+        self.stdout.write(self.style.SUCCESS("All scores match their score events."))
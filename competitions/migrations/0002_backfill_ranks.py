@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:05
+
+from django.db import migrations
+
+RANK_SQL = """
+UPDATE {table} AS entry
+SET rank = ranked.rank
+FROM (
+    SELECT id,
+           CASE WHEN disqualified THEN 0
+                ELSE DENSE_RANK() OVER (
+                    PARTITION BY competition_id, disqualified
+                    ORDER BY score DESC
+                )
+           END AS rank
+    FROM {table}
+) AS ranked
+WHERE entry.id = ranked.id AND entry.rank <> ranked.rank
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('competitions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            RANK_SQL.format(table='competitions_schoolcompetitionentry'),
+            migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            RANK_SQL.format(table='competitions_studentcompetitionentry'),
+            migrations.RunSQL.noop,
+        ),
+    ]
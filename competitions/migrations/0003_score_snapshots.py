@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('competitions', '0002_backfill_ranks'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='competitionscoreevent',
+            index=models.Index(fields=['competition', 'id'], name='score_event_comp_id_idx'),
+        ),
+        migrations.CreateModel(
+            name='CompetitionScoreSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_active', models.BooleanField(db_index=True, default=True)),
+                ('last_event_id', models.PositiveBigIntegerField()),
+                ('event_count', models.PositiveIntegerField(default=0, help_text='Events rolled up since the first snapshot')),
+                ('compacted', models.BooleanField(default=False, help_text='Covered events were archived and deleted')),
+                ('archive', models.FileField(blank=True, upload_to='competitions/score_archives/')),
+                ('competition', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_snapshots', to='competitions.competition')),
+            ],
+            options={
+                'ordering': ['-last_event_id'],
+                'indexes': [models.Index(fields=['competition', '-last_event_id'], name='score_snapshot_comp_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CompetitionScoreTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('manual', 'Manual'), ('activity', 'Activity'), ('bonus', 'Bonus'), ('penalty', 'Penalty')], max_length=20)),
+                ('points', models.IntegerField()),
+                ('events', models.PositiveIntegerField()),
+                ('school', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='organizations.school')),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='totals', to='competitions.competitionscoresnapshot')),
+                ('student', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='organizations.studentprofile')),
+            ],
+            options={
+                'constraints': [models.CheckConstraint(condition=models.Q(models.Q(('school__isnull', False), ('student__isnull', True)), models.Q(('school__isnull', True), ('student__isnull', False)), _connector='OR'), name='score_total_one_target')],
+            },
+        ),
+    ]
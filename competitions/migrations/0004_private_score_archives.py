@@ -0,0 +1,36 @@
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+import lenextra.storage
+
+
+def move_archives(apps, schema_editor):
+    # Archives written so far sit under MEDIA_ROOT, where anyone can
+    # download them: move them to the private storage under the same name.
+    CompetitionScoreSnapshot = apps.get_model('competitions', 'CompetitionScoreSnapshot')
+    private = lenextra.storage.get_private_storage()
+    for snapshot in CompetitionScoreSnapshot.objects.exclude(archive=''):
+        name = snapshot.archive.name
+        if not default_storage.exists(name):
+            continue
+        with default_storage.open(name, 'rb') as src:
+            saved = private.save(name, src)
+        default_storage.delete(name)
+        if saved != name:
+            CompetitionScoreSnapshot.objects.filter(pk=snapshot.pk).update(archive=saved)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('competitions', '0003_score_snapshots'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='competitionscoresnapshot',
+            name='archive',
+            field=models.FileField(blank=True, storage=lenextra.storage.get_private_storage, upload_to='competitions/score_archives/'),
+        ),
+        migrations.RunPython(move_archives, migrations.RunPython.noop),
+    ]
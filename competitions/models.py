@@ -7,6 +7,7 @@ from django.urls import reverse
 from django.core.exceptions import ValidationError
 from django.conf import settings
 from organizations import models as organizations
+from lenextra.storage import get_private_storage
 
 # Create your models here.
 class TimeStampedModel(models.Model):
@@ -163,8 +164,19 @@ class SchoolCompetitionEntry(TimeStampedModel):
     @transaction.atomic
     def add_points(self, points: int, reason: str = "", category: str = "manual", by=None):
         # Atomic increment and audit trail
-        type(self).objects.filter(pk=self.pk).update(score=F("score") + points)
-        self.refresh_from_db(fields=["score"])
+        ranks.share_scoring(self.competition_id)
+        # the board encodes scores within +-MAX_SCORE, as apply_awards() checks
+        updated = type(self).objects.filter(
+            pk=self.pk,
+            score__gte=-leaderboard.MAX_SCORE - points,
+            score__lte=leaderboard.MAX_SCORE - points,
+        ).update(score=F("score") + points)
+        if not updated:
+            raise ValidationError(f"Score would leave the range +-{leaderboard.MAX_SCORE}.")
+        self.refresh_from_db(fields=["score", "disqualified"])
+        if not self.disqualified:
+            ranks.schedule(type(self), self.competition_id)
+        leaderboard.record_points(self, points)
         CompetitionScoreEvent.objects.create(
             competition=self.competition,
             school=self.school,
@@ -175,9 +187,14 @@ class SchoolCompetitionEntry(TimeStampedModel):
         )
         return self.score
 
+    @transaction.atomic
     def disqualify(self, reason: str = "", by=None):
-        self.disqualified = True
-        self.save(update_fields=["disqualified", "updated_at"])
+        self.refresh_from_db(fields=["disqualified"])
+        if not self.disqualified:
+            self.disqualified = True
+            self.rank = 0
+            self.save(update_fields=["disqualified", "rank", "updated_at"])
+            ranks.schedule(type(self), self.competition_id)
         CompetitionDisqualification.objects.create(
             competition=self.competition,
             school=self.school,
@@ -209,8 +226,19 @@ class StudentCompetitionEntry(TimeStampedModel):
 
     @transaction.atomic
     def add_points(self, points: int, reason: str = "", category: str = "manual", by=None):
-        type(self).objects.filter(pk=self.pk).update(score=F("score") + points)
-        self.refresh_from_db(fields=["score"])
+        ranks.share_scoring(self.competition_id)
+        # the board encodes scores within +-MAX_SCORE, as apply_awards() checks
+        updated = type(self).objects.filter(
+            pk=self.pk,
+            score__gte=-leaderboard.MAX_SCORE - points,
+            score__lte=leaderboard.MAX_SCORE - points,
+        ).update(score=F("score") + points)
+        if not updated:
+            raise ValidationError(f"Score would leave the range +-{leaderboard.MAX_SCORE}.")
+        self.refresh_from_db(fields=["score", "disqualified"])
+        if not self.disqualified:
+            ranks.schedule(type(self), self.competition_id)
+        leaderboard.record_points(self, points)
         CompetitionScoreEvent.objects.create(
             competition=self.competition,
             student=self.student,
@@ -221,9 +249,14 @@ class StudentCompetitionEntry(TimeStampedModel):
         )
         return self.score
 
+    @transaction.atomic
     def disqualify(self, reason: str = "", by=None):
-        self.disqualified = True
-        self.save(update_fields=["disqualified", "updated_at"])
+        self.refresh_from_db(fields=["disqualified"])
+        if not self.disqualified:
+            self.disqualified = True
+            self.rank = 0
+            self.save(update_fields=["disqualified", "rank", "updated_at"])
+            ranks.schedule(type(self), self.competition_id)
         CompetitionDisqualification.objects.create(
             competition=self.competition,
             student=self.student,
@@ -259,6 +292,8 @@ class CompetitionScoreEvent(TimeStampedModel):
         ordering = ["-created_at"]
         indexes = [
             Index(fields=["competition", "-created_at"]),
+            # snapshot windows and tails are id ranges
+            Index(fields=["competition", "id"], name="score_event_comp_id_idx"),
             Index(fields=["school"]),
             Index(fields=["student"]),
         ]
@@ -301,3 +336,60 @@ class CompetitionDisqualification(TimeStampedModel):
     def __str__(self):
         target = self.school or self.student
         return f"DQ: {target} from {self.competition}"
+
+
+class CompetitionScoreSnapshot(TimeStampedModel):
+    """
+    Score totals of a competition as of one score event: the sum of every
+    event with an id up to `last_event_id`, per school or student and
+    category, is kept in `totals`. Scores equal the latest snapshot plus the
+    events after it, which is what lets compaction delete the events it
+    covers.
+    """
+    competition = models.ForeignKey(Competition, on_delete=models.CASCADE, related_name="score_snapshots")
+    last_event_id = models.PositiveBigIntegerField()
+    event_count = models.PositiveIntegerField(default=0, help_text="Events rolled up since the first snapshot")
+    compacted = models.BooleanField(default=False, help_text="Covered events were archived and deleted")
+    archive = models.FileField(
+        upload_to="competitions/score_archives/", storage=get_private_storage, blank=True
+    )
+
+    class Meta:
+        ordering = ["-last_event_id"]
+        indexes = [
+            Index(fields=["competition", "-last_event_id"], name="score_snapshot_comp_idx"),
+        ]
+
+    def __str__(self):
+        return f"Snapshot of {self.competition} @ event {self.last_event_id}"
+
+
+class CompetitionScoreTotal(models.Model):
+    snapshot = models.ForeignKey(CompetitionScoreSnapshot, on_delete=models.CASCADE, related_name="totals")
+    # One of these will be set
+    school = models.ForeignKey(
+        "organizations.School", on_delete=models.CASCADE, null=True, blank=True, related_name="+"
+    )
+    student = models.ForeignKey(
+        "organizations.StudentProfile", on_delete=models.CASCADE, null=True, blank=True, related_name="+"
+    )
+    category = models.CharField(max_length=20, choices=CompetitionScoreEvent.CATEGORY_CHOICES)
+    points = models.IntegerField()
+    events = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                check=Q(school__isnull=False, student__isnull=True)
+                | Q(school__isnull=True, student__isnull=False),
+                name="score_total_one_target",
+            )
+        ]
+
+    def __str__(self):
+        target = self.school or self.student
+        return f"{self.points:+} {self.category} pts to {target}"
+
+
+# Imported last: both need the entry models above.
+from . import leaderboard, ranks  # noqa: E402
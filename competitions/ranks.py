@@ -0,0 +1,233 @@
+"""
+Maintenance of the cached `rank` column of competition entries.
+
+`rank` is the dense rank of the entry score among the entries of its
+competition that are not disqualified (ties share a rank, the next score
+down gets the next rank); disqualified entries have rank 0.
+
+Scoring does not rank: `add_points()`, `disqualify()` and batched awards
+only `schedule()` a re-rank of the board after they commit. Re-ranks of a
+board are coalesced per process to one `recompute()` (one DENSE_RANK()
+UPDATE) every RECOMPUTE_DELAY seconds, so concurrent scoring never waits on
+ranking and `rank` trails the scores by about that long. A re-rank lost with
+its process is made up by the next change to the board, or by the
+`recalc_ranks` admin action.
+
+Entries created, deleted or saved in full (admin forms) are placed in
+place instead: moving an entry from one score to another only changes the
+ranks of the entries scored between the two, except that under dense
+ranking a score value appearing or disappearing moves every lower entry by
+one place, which is one `rank = rank +- 1` UPDATE.
+
+Rank writers of one board (placing, `recompute()`, admin bulk actions) are
+serialized by a transaction-level advisory lock, so they never compute from
+each other's uncommitted state. Scoring only takes the competition's
+scoring lock in shared mode, which snapshots take exclusively to fix their
+event boundary. Off PostgreSQL (sqlite in local settings) the locks are
+no-ops, sqlite already serializes writers.
+"""
+import threading
+
+from django.db import connections, router, transaction
+from django.db.models import F
+
+from lenextra.background import run_in_background
+
+from .models import SchoolCompetitionEntry, StudentCompetitionEntry
+
+# First key of the advisory locks, one lock space per board.
+LOCK_SPACES = {
+    SchoolCompetitionEntry: 7301,
+    StudentCompetitionEntry: 7302,
+}
+# First key of the scoring locks, one per competition.
+SCORING_LOCK_SPACE = 7300
+# Coalescing window of the re-ranks scheduled by scoring.
+RECOMPUTE_DELAY = 1.0
+
+_pending = set()
+_pending_lock = threading.Lock()
+
+RECOMPUTE_SQL = """
+UPDATE {table} AS entry
+SET rank = ranked.rank
+FROM (
+    SELECT id,
+           CASE WHEN disqualified THEN 0
+                ELSE DENSE_RANK() OVER (
+                    PARTITION BY competition_id, disqualified
+                    ORDER BY score DESC
+                )
+           END AS rank
+    FROM {table}
+    WHERE competition_id IN ({ids})
+) AS ranked
+WHERE entry.id = ranked.id AND entry.rank <> ranked.rank
+"""
+
+
+def _connection(model):
+    return connections[router.db_for_write(model)]
+
+
+def lock(model, competition_id):
+    """
+    Take the rank lock of one board until the end of the transaction. Take
+    it before updating entry rows, so lock order is always board then rows.
+    """
+    connection = _connection(model)
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_advisory_xact_lock(%s, %s)",
+            [LOCK_SPACES[model], competition_id],
+        )
+
+
+def lock_all(model, competition_ids):
+    """
+    Take the rank locks of several boards, in a fixed order.
+    """
+    for competition_id in sorted(set(competition_ids)):
+        lock(model, competition_id)
+
+
+def _scoring_lock(competition_id, function):
+    connection = connections[router.db_for_write(SchoolCompetitionEntry)]
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT {function}(%s, %s)", [SCORING_LOCK_SPACE, competition_id]
+        )
+
+
+def share_scoring(competition_id):
+    """
+    Take the scoring lock of a competition in shared mode until the end of
+    the transaction. Taken by everything that writes score events; scorers
+    do not block each other.
+    """
+    _scoring_lock(competition_id, 'pg_advisory_xact_lock_shared')
+
+
+def block_scoring(competition_id):
+    """
+    Take the scoring lock of a competition exclusively until the end of the
+    transaction: waits for the scoring in flight to commit and holds off new
+    scoring meanwhile.
+    """
+    _scoring_lock(competition_id, 'pg_advisory_xact_lock')
+
+
+def _place(entry, old_score, new_score):
+    """
+    Adjust ranks after `entry` left `old_score` and took `new_score`. Either
+    may be None, for an entry joining or leaving the ranking. The entry row
+    must already hold its new state.
+    """
+    if old_score == new_score:
+        return
+    model = type(entry)
+    others = model.objects.filter(
+        competition_id=entry.competition_id, disqualified=False
+    ).exclude(pk=entry.pk)
+
+    vacated = old_score is not None and not others.filter(score=old_score).exists()
+    added = new_score is not None and not others.filter(score=new_score).exists()
+    if vacated and added:
+        low, high = sorted((old_score, new_score))
+        step = 1 if new_score > old_score else -1
+        others.filter(score__gt=low, score__lt=high).update(rank=F("rank") + step)
+    elif added:
+        others.filter(score__lt=new_score).update(rank=F("rank") + 1)
+    elif vacated:
+        others.filter(score__lt=old_score).update(rank=F("rank") - 1)
+
+    if new_score is None:
+        rank = 0
+    else:
+        tie = others.filter(score=new_score).values_list("rank", flat=True).first()
+        if tie is not None:
+            rank = tie
+        else:
+            above = (
+                others.filter(score__gt=new_score)
+                .order_by("score")
+                .values_list("rank", flat=True)
+                .first()
+            )
+            rank = 1 if above is None else above + 1
+    model.objects.filter(pk=entry.pk).update(rank=rank)
+    entry.rank = rank
+
+
+def joined(entry):
+    if entry.disqualified:
+        return
+    with transaction.atomic():
+        lock(type(entry), entry.competition_id)
+        _place(entry, None, entry.score)
+
+
+def deleted(entry):
+    if entry.disqualified:
+        return
+    with transaction.atomic():
+        lock(type(entry), entry.competition_id)
+        _place(entry, entry.score, None)
+
+
+def changed(entry, old_score, was_disqualified):
+    """
+    Re-rank after a full save changed the entry's score or disqualification.
+    """
+    old = None if was_disqualified else old_score
+    new = None if entry.disqualified else entry.score
+    with transaction.atomic():
+        lock(type(entry), entry.competition_id)
+        _place(entry, old, new)
+
+
+def recompute(model, competition_ids):
+    """
+    Re-rank every entry of the given competitions with one statement.
+    Returns the number of entries whose rank changed.
+    """
+    competition_ids = sorted(set(competition_ids))
+    if not competition_ids:
+        return 0
+    connection = _connection(model)
+    table = connection.ops.quote_name(model._meta.db_table)
+    sql = RECOMPUTE_SQL.format(table=table, ids=", ".join(["%s"] * len(competition_ids)))
+    with transaction.atomic(using=connection.alias):
+        lock_all(model, competition_ids)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, competition_ids)
+            return cursor.rowcount
+
+
+def schedule(model, competition_id):
+    """
+    Re-rank the board shortly after the current transaction commits,
+    together with the other changes to it in that window.
+    """
+    transaction.on_commit(lambda: _coalesce(model, competition_id))
+
+
+def _coalesce(model, competition_id):
+    with _pending_lock:
+        if (model, competition_id) in _pending:
+            return
+        _pending.add((model, competition_id))
+    timer = threading.Timer(RECOMPUTE_DELAY, _recompute_pending, args=[model, competition_id])
+    timer.daemon = True
+    timer.start()
+
+
+def _recompute_pending(model, competition_id):
+    # drop the mark first: a change committed from now on schedules the next run
+    with _pending_lock:
+        _pending.discard((model, competition_id))
+    run_in_background(recompute, model, [competition_id])
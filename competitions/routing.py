@@ -0,0 +1,11 @@
+from django.urls import re_path
+
+from . import consumers
+
+
+websocket_urlpatterns = [
+    re_path(
+        r"ws/competitions/(?P<slug>[-\w]+)/$",
+        consumers.LeaderboardConsumer.as_asgi(),
+    ),
+]
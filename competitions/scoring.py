@@ -0,0 +1,151 @@
+"""
+Batched score awards.
+
+`apply_awards()` is the bulk counterpart of `add_points()` for judging
+systems that report many results at once: it validates every award with one
+query per entry table, applies the summed deltas with one
+`UPDATE ... FROM (VALUES ...)` per chunk (a CASE update off PostgreSQL),
+bulk inserts the score events, schedules a re-rank of each touched board
+and updates the Redis leaderboards (and the live push) in one round trip
+per board after commit.
+"""
+from collections import defaultdict, namedtuple
+
+from django.core.exceptions import ValidationError
+from django.db import connections, router, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from . import leaderboard, ranks
+from .models import CompetitionScoreEvent
+
+Award = namedtuple("Award", "kind entry_id points category reason")
+
+TARGET_FIELDS = {
+    leaderboard.SCHOOLS: "school_id",
+    leaderboard.STUDENTS: "student_id",
+}
+UPDATE_CHUNK = 5000
+EVENT_BATCH = 1000
+
+UPDATE_SQL = """
+UPDATE {table} AS entry
+SET score = entry.score + batch.points
+FROM (VALUES {values}) AS batch (id, points)
+WHERE entry.id = batch.id
+"""
+
+
+def _targets(competition, kind, entry_ids):
+    """
+    {entry_id: (school or student id, score)} of the entries that can score,
+    locked until commit so their scores cannot change before the update.
+    """
+    model = leaderboard.ENTRY_MODELS[kind]
+    rows = (
+        model.objects.filter(competition=competition, pk__in=entry_ids, disqualified=False)
+        .order_by("pk")
+        .select_for_update()
+        .values_list("pk", TARGET_FIELDS[kind], "score")
+    )
+    return {pk: (target_id, score) for pk, target_id, score in rows}
+
+
+def _add_scores(model, deltas):
+    connection = connections[router.db_for_write(model)]
+    rows = list(deltas.items())
+    if connection.vendor != "postgresql":
+        # no typed VALUES lists elsewhere: one CASE per chunk instead
+        for start in range(0, len(rows), UPDATE_CHUNK):
+            chunk = rows[start:start + UPDATE_CHUNK]
+            model.objects.filter(pk__in=[entry_id for entry_id, _ in chunk]).update(
+                score=F("score") + Case(
+                    *[When(pk=entry_id, then=Value(points)) for entry_id, points in chunk],
+                    default=Value(0),
+                    output_field=IntegerField(),
+                )
+            )
+        return
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPDATE_CHUNK):
+            chunk = rows[start:start + UPDATE_CHUNK]
+            # the first row carries the column types for the rest
+            values = ", ".join(
+                ["(%s::integer, %s::integer)"] + ["(%s, %s)"] * (len(chunk) - 1)
+            )
+            params = [value for row in chunk for value in row]
+            cursor.execute(UPDATE_SQL.format(table=table, values=values), params)
+
+
+def apply_awards(competition, awards, by=None):
+    """
+    Apply `awards` (a sequence of Award) to `competition` atomically, or
+    raise ValidationError mapping the index of every bad award to its error
+    without applying any. Returns the number of entries whose score changed.
+    """
+    if not competition.is_active:
+        raise ValidationError("Competition is not active.")
+    if competition.status == "finished":
+        raise ValidationError("Competition has finished.")
+
+    by_kind = defaultdict(list)
+    for index, award in enumerate(awards):
+        by_kind[award.kind].append(index)
+
+    with transaction.atomic():
+        ranks.share_scoring(competition.pk)
+
+        targets = {
+            kind: _targets(competition, kind, {awards[i].entry_id for i in indexes})
+            for kind, indexes in sorted(by_kind.items())
+        }
+        errors = {
+            str(index): "Unknown or disqualified entry."
+            for kind, indexes in by_kind.items()
+            for index in indexes
+            if awards[index].entry_id not in targets[kind]
+        }
+        if errors:
+            raise ValidationError(errors)
+
+        # the summed change of an entry must keep its score within what the
+        # score column and the leaderboard encoding hold
+        for kind, indexes in by_kind.items():
+            deltas = defaultdict(int)
+            for index in indexes:
+                deltas[awards[index].entry_id] += awards[index].points
+            for index in indexes:
+                entry_id = awards[index].entry_id
+                if abs(targets[kind][entry_id][1] + deltas[entry_id]) > leaderboard.MAX_SCORE:
+                    errors[str(index)] = f"Score would leave the range +-{leaderboard.MAX_SCORE}."
+        if errors:
+            raise ValidationError(errors)
+
+        created_by = by if by is not None and by.is_authenticated else None
+        events = []
+        changed = 0
+        for kind, indexes in sorted(by_kind.items()):
+            model = leaderboard.ENTRY_MODELS[kind]
+            deltas = defaultdict(int)
+            for index in indexes:
+                award = awards[index]
+                deltas[award.entry_id] += award.points
+                events.append(
+                    CompetitionScoreEvent(
+                        competition=competition,
+                        points=award.points,
+                        category=award.category,
+                        reason=award.reason or "",
+                        created_by=created_by,
+                        **{TARGET_FIELDS[kind]: targets[kind][award.entry_id][0]},
+                    )
+                )
+            deltas = {entry_id: points for entry_id, points in deltas.items() if points}
+            if not deltas:
+                continue
+            _add_scores(model, deltas)
+            ranks.schedule(model, competition.pk)
+            leaderboard.record_batch(competition.pk, kind, deltas)
+            changed += len(deltas)
+        CompetitionScoreEvent.objects.bulk_create(events, batch_size=EVENT_BATCH)
+    return changed
@@ -0,0 +1,48 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import leaderboard, ranks
+from .models import SchoolCompetitionEntry, StudentCompetitionEntry
+
+
+@receiver(post_save, sender=SchoolCompetitionEntry)
+@receiver(post_save, sender=StudentCompetitionEntry)
+def store_leaderboard_entry(sender, instance, created, update_fields=None, **kwargs):
+    # add_points() updates the score with UPDATE and reports it itself
+    if created or update_fields is None or "score" in update_fields:
+        leaderboard.record_score(instance)
+
+
+@receiver(post_delete, sender=SchoolCompetitionEntry)
+@receiver(post_delete, sender=StudentCompetitionEntry)
+def remove_leaderboard_entry(sender, instance, **kwargs):
+    leaderboard.record_removal(instance)
+
+
+@receiver(pre_save, sender=SchoolCompetitionEntry)
+@receiver(pre_save, sender=StudentCompetitionEntry)
+def remember_ranked_fields(sender, instance, update_fields=None, **kwargs):
+    instance._previous_ranked = None
+    if instance.pk and update_fields is None:
+        instance._previous_ranked = (
+            sender.objects.filter(pk=instance.pk).values_list("score", "disqualified").first()
+        )
+
+
+@receiver(post_save, sender=SchoolCompetitionEntry)
+@receiver(post_save, sender=StudentCompetitionEntry)
+def rank_entry(sender, instance, created, update_fields=None, **kwargs):
+    # add_points() and disqualify() schedule their re-rank themselves
+    if created:
+        ranks.joined(instance)
+        return
+    previous = getattr(instance, "_previous_ranked", None)
+    if previous is not None and previous != (instance.score, instance.disqualified):
+        # a full save (admin forms) may change score and disqualified at once
+        ranks.changed(instance, *previous)
+
+
+@receiver(post_delete, sender=SchoolCompetitionEntry)
+@receiver(post_delete, sender=StudentCompetitionEntry)
+def unrank_entry(sender, instance, **kwargs):
+    ranks.deleted(instance)
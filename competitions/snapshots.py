@@ -0,0 +1,195 @@
+"""
+Score snapshots and event log compaction.
+
+A snapshot rolls the score events of a competition up to a given event id
+into per-school / per-student, per-category totals, on top of the previous
+snapshot. Compaction then writes the covered events to a gzipped JSON-lines
+archive in the private storage, which is not served, and deletes them, so
+the event table only holds the tail after the latest snapshot while
+`verify()` can still check every score against snapshot + tail.
+
+The snapshot boundary is read under the exclusive scoring lock of the
+competition: scoring holds it shared until it commits, so once the lock is
+granted no event with an id below the boundary can still be in flight, and
+events written after it is released get higher ids. The lock is released
+right away; rolling up, archiving and deleting the events up to the
+boundary do not hold off scoring.
+"""
+import gzip
+import json
+import tempfile
+from collections import defaultdict
+
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+
+from lenextra.storage import private_storage
+
+from . import leaderboard, ranks
+from .models import Competition, CompetitionScoreEvent, CompetitionScoreSnapshot, CompetitionScoreTotal
+
+TOTAL_BATCH = 1000
+ARCHIVE_CHUNK = 5000
+ARCHIVE_FIELDS = (
+    "id", "school_id", "student_id", "points", "category", "reason", "created_by_id", "created_at",
+)
+TARGET_FIELDS = {
+    leaderboard.SCHOOLS: "school",
+    leaderboard.STUDENTS: "student",
+}
+
+
+def latest(competition):
+    return competition.score_snapshots.order_by("-last_event_id").first()
+
+
+def _archive(competition, events):
+    """
+    Write `events` to a gzipped JSON-lines file and return its storage name.
+    """
+    first = last = None
+    with tempfile.TemporaryFile() as tmp:
+        with gzip.GzipFile(fileobj=tmp, mode="wb") as out:
+            for row in events.order_by("pk").values(*ARCHIVE_FIELDS).iterator(chunk_size=ARCHIVE_CHUNK):
+                first = row["id"] if first is None else first
+                last = row["id"]
+                row["created_at"] = row["created_at"].isoformat()
+                out.write(json.dumps(row).encode() + b"\n")
+        if first is None:
+            return ""
+        tmp.seek(0)
+        name = f"competitions/score_archives/{competition.pk}/events-{first}-{last}.jsonl.gz"
+        return private_storage.save(name, File(tmp))
+
+
+def _boundary(competition, before):
+    """
+    Id of the last event (created before `before`, if given) that is
+    committed, or None.
+    """
+    with transaction.atomic():
+        ranks.block_scoring(competition.pk)
+        events = CompetitionScoreEvent.objects.filter(competition=competition)
+        if before is not None:
+            events = events.filter(created_at__lt=before)
+        return events.aggregate(last=Max("pk"))["last"]
+
+
+def take(competition, before=None, compact=False):
+    """
+    Snapshot the events of `competition` (only those created before
+    `before`, if given) and, with `compact`, archive and delete the events
+    the snapshot covers. Returns the new snapshot, or the latest one if
+    there was nothing new to roll up.
+
+    Run it outside of any transaction: the archive of a compaction that
+    fails is deleted again, which needs the atomic block here to be the one
+    that commits.
+    """
+    last = _boundary(competition, before)
+    archive = ""
+    try:
+        with transaction.atomic():
+            # one snapshot at a time; NO KEY UPDATE lets events still be added
+            Competition.objects.select_for_update(no_key=True).get(pk=competition.pk)
+            previous = latest(competition)
+            start = previous.last_event_id if previous else 0
+            if last is None or last <= start:
+                return previous
+
+            totals = defaultdict(lambda: [0, 0])
+            if previous:
+                for school_id, student_id, category, points, events in previous.totals.values_list(
+                    "school_id", "student_id", "category", "points", "events"
+                ):
+                    total = totals[school_id, student_id, category]
+                    total[0] += points
+                    total[1] += events
+            window = CompetitionScoreEvent.objects.filter(
+                competition=competition, pk__gt=start, pk__lte=last
+            )
+            rows = (
+                window.order_by()
+                .values("school_id", "student_id", "category")
+                .annotate(points=Sum("points"), events=Count("pk"))
+            )
+            rolled_up = 0
+            for row in rows:
+                total = totals[row["school_id"], row["student_id"], row["category"]]
+                total[0] += row["points"]
+                total[1] += row["events"]
+                rolled_up += row["events"]
+
+            snapshot = CompetitionScoreSnapshot.objects.create(
+                competition=competition,
+                last_event_id=last,
+                event_count=(previous.event_count if previous else 0) + rolled_up,
+            )
+            CompetitionScoreTotal.objects.bulk_create(
+                [
+                    CompetitionScoreTotal(
+                        snapshot=snapshot,
+                        school_id=school_id,
+                        student_id=student_id,
+                        category=category,
+                        points=points,
+                        events=events,
+                    )
+                    for (school_id, student_id, category), (points, events) in totals.items()
+                ],
+                batch_size=TOTAL_BATCH,
+            )
+            if previous:
+                # the new totals include the old ones
+                previous.totals.all().delete()
+
+            if compact:
+                # everything up to the boundary, including windows of earlier
+                # snapshots taken without compaction
+                covered = CompetitionScoreEvent.objects.filter(competition=competition, pk__lte=last)
+                archive = snapshot.archive.name = _archive(competition, covered)
+                snapshot.compacted = True
+                snapshot.save(update_fields=["archive", "compacted", "updated_at"])
+                covered.delete()
+    except BaseException:
+        # the snapshot was rolled back, so nothing refers to its archive
+        if archive:
+            private_storage.delete(archive)
+        raise
+    return snapshot
+
+
+def verify(competition):
+    """
+    Compare every entry score with the latest snapshot plus the events
+    after it. Returns [(kind, entry, score, expected)] for the entries that
+    differ.
+    """
+    mismatches = []
+    with transaction.atomic():
+        ranks.block_scoring(competition.pk)
+        snapshot = latest(competition)
+        start = snapshot.last_event_id if snapshot else 0
+        tail = CompetitionScoreEvent.objects.filter(competition=competition, pk__gt=start).order_by()
+        for kind, field in TARGET_FIELDS.items():
+            expected = defaultdict(int)
+            if snapshot:
+                rows = (
+                    snapshot.totals.filter(**{f"{field}__isnull": False})
+                    .order_by()
+                    .values_list(field)
+                    .annotate(points=Sum("points"))
+                )
+                for target_id, points in rows:
+                    expected[target_id] += points
+            rows = tail.filter(**{f"{field}__isnull": False}).values_list(field).annotate(points=Sum("points"))
+            for target_id, points in rows:
+                expected[target_id] += points
+
+            entries = leaderboard.ENTRY_MODELS[kind].objects.filter(competition=competition)
+            for entry in entries.only("id", "score", field).order_by("pk").iterator():
+                want = expected.get(getattr(entry, f"{field}_id"), 0)
+                if entry.score != want:
+                    mismatches.append((kind, entry, entry.score, want))
+    return mismatches
@@ -1,3 +1,82 @@
+import datetime
+
 from django.test import TestCase
 
-# Create your tests here.
+from organizations.models import School
+
+from . import ranks
+from .models import Competition, SchoolCompetitionEntry
+
+
+class PlaceTests(TestCase):
+    """
+    `ranks._place()` must leave every entry with its dense rank.
+    """
+
+    def setUp(self):
+        today = datetime.date.today()
+        self.competition = Competition.objects.create(
+            name="Robotics Cup", comp_type="local", start_date=today, end_date=today
+        )
+        # bypasses the signals, the ranks are set by hand
+        self.entries = SchoolCompetitionEntry.objects.bulk_create(
+            [
+                SchoolCompetitionEntry(
+                    competition=self.competition,
+                    school=School.objects.create(name=f"School {index}"),
+                    score=score,
+                    rank=rank,
+                )
+                for index, (score, rank) in enumerate([(50, 1), (40, 2), (40, 2), (30, 3)])
+            ]
+        )
+
+    def move(self, index, new_score):
+        entry = self.entries[index]
+        old_score = entry.score
+        SchoolCompetitionEntry.objects.filter(pk=entry.pk).update(score=new_score)
+        entry.refresh_from_db()
+        ranks._place(entry, old_score, new_score)
+
+    def assertRanks(self, expected):
+        rows = SchoolCompetitionEntry.objects.filter(competition=self.competition)
+        ranked = sorted(rows.values_list("score", "rank"), reverse=True)
+        self.assertEqual(ranked, expected)
+        scores = sorted({score for score, _ in ranked}, reverse=True)
+        for score, rank in ranked:
+            self.assertEqual(rank, scores.index(score) + 1)
+
+    def test_move_into_tie(self):
+        # 30 is vacated, 40 already exists: nothing else moves
+        self.move(3, 40)
+        self.assertRanks([(50, 1), (40, 2), (40, 2), (40, 2)])
+
+    def test_leave_tie_for_new_value(self):
+        # 40 stays taken, 45 is added: everything below 45 moves down
+        self.move(1, 45)
+        self.assertRanks([(50, 1), (45, 2), (40, 3), (30, 4)])
+
+    def test_vacate_value(self):
+        # 50 is vacated into the 40 tie: everything below 50 moves up
+        self.move(0, 40)
+        self.assertRanks([(40, 1), (40, 1), (40, 1), (30, 2)])
+
+    def test_vacate_and_add(self):
+        # 30 is vacated and 60 added: only the band between moves down
+        self.move(3, 60)
+        self.assertRanks([(60, 1), (50, 2), (40, 3), (40, 3)])
+
+    def test_vacate_and_add_downwards(self):
+        self.move(0, 35)
+        self.assertRanks([(40, 1), (40, 1), (35, 2), (30, 3)])
+
+    def test_leave_ranking(self):
+        entry = self.entries[0]
+        SchoolCompetitionEntry.objects.filter(pk=entry.pk).update(disqualified=True)
+        ranks._place(entry, entry.score, None)
+        self.assertEqual(entry.rank, 0)
+        rows = SchoolCompetitionEntry.objects.filter(competition=self.competition, disqualified=False)
+        self.assertEqual(
+            sorted(rows.values_list("score", "rank"), reverse=True),
+            [(40, 1), (40, 1), (30, 2)],
+        )
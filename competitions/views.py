@@ -1,10 +1,14 @@
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
+from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator
 from django.db.models import Q, Count
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse
 
+from lenextra.db import replica_reads
+
+from . import leaderboard
 from .models import (
     Competition,
     SchoolCompetitionEntry,
@@ -27,6 +31,16 @@ def _paginate(request, qs, per_page=25, page_param="page"):
     return paginator.get_page(request.GET.get(page_param))
 
 
+def _has_filters(filter_form):
+    """
+    Whether the leaderboard must be filtered in SQL; unfiltered pages are
+    read from the Redis leaderboard.
+    """
+    return filter_form.is_valid() and any(
+        value not in (None, "", False) for value in filter_form.cleaned_data.values()
+    )
+
+
 # -------- Competitions --------
 def competition_list(request):
     """
@@ -74,8 +88,12 @@ def competition_detail(request, slug):
     comp = get_object_or_404(
         Competition.objects.select_related("discipline"), slug=slug
     )
-    school_entries = comp.leaderboard_schools()
-    student_entries = comp.leaderboard_students()
+    school_entries = leaderboard.LeaderboardPage(
+        leaderboard.Leaderboard(comp.pk, leaderboard.SCHOOLS), comp.leaderboard_schools()
+    )
+    student_entries = leaderboard.LeaderboardPage(
+        leaderboard.Leaderboard(comp.pk, leaderboard.STUDENTS), comp.leaderboard_students()
+    )
 
     school_entries_page = _paginate(request, school_entries, per_page=25, page_param="spage")
     student_entries_page = _paginate(request, student_entries, per_page=25, page_param="tpage")
@@ -167,9 +185,13 @@ def score_points(request, slug):
     if request.method == "POST":
         form = ScorePointsForm(request.POST, competition=comp)
         if form.is_valid():
-            target = form.save(user=request.user)
-            messages.success(request, f"Points updated for {target}.")
-            return redirect("competitions:competition_detail", slug=comp.slug)
+            try:
+                target = form.save(user=request.user)
+            except ValidationError as error:
+                form.add_error(None, error)
+            else:
+                messages.success(request, f"Points updated for {target}.")
+                return redirect("competitions:competition_detail", slug=comp.slug)
     else:
         form = ScorePointsForm(competition=comp)
     return render(request, "competitions/score_points.html", {"form": form, "competition": comp})
@@ -193,6 +215,7 @@ def disqualify_entry(request, slug):
 
 
 # -------- Leaderboards --------
+@replica_reads
 def leaderboard_schools(request, slug):
     """
     Per-competition school leaderboard with filters.
@@ -200,8 +223,11 @@ def leaderboard_schools(request, slug):
     comp = get_object_or_404(Competition, slug=slug)
     qs = SchoolCompetitionEntry.objects.select_related("school", "competition").filter(competition=comp)
     filter_form = LeaderboardFilterForm(request.GET or None)
-    qs = filter_form.apply_to_school_qs(qs)
-    entries = _paginate(request, qs.order_by("-score", "created_at"), per_page=50)
+    if _has_filters(filter_form):
+        qs = filter_form.apply_to_school_qs(qs).order_by("-score", "created_at")
+    else:
+        qs = leaderboard.LeaderboardPage(leaderboard.Leaderboard(comp.pk, leaderboard.SCHOOLS), qs)
+    entries = _paginate(request, qs, per_page=50)
     return render(
         request,
         "competitions/leaderboard_schools.html",
@@ -209,6 +235,7 @@ def leaderboard_schools(request, slug):
     )
 
 
+@replica_reads
 def leaderboard_students(request, slug):
     """
     Per-competition student leaderboard with filters.
@@ -218,8 +245,11 @@ def leaderboard_students(request, slug):
         competition=comp
     )
     filter_form = LeaderboardFilterForm(request.GET or None)
-    qs = filter_form.apply_to_student_qs(qs)
-    entries = _paginate(request, qs.order_by("-score", "created_at"), per_page=50)
+    if _has_filters(filter_form):
+        qs = filter_form.apply_to_student_qs(qs).order_by("-score", "created_at")
+    else:
+        qs = leaderboard.LeaderboardPage(leaderboard.Leaderboard(comp.pk, leaderboard.STUDENTS), qs)
+    entries = _paginate(request, qs, per_page=50)
     return render(
         request,
         "competitions/leaderboard_students.html",
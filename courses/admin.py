@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Subject, Course, Module, Appointment, InstructorProfile
+from .models import Subject, Course, CoursePackage, MediaBlob, Module, Appointment, InstructorProfile
 
 @admin.register(Subject)
 class SubjectAdmin(admin.ModelAdmin):
@@ -18,6 +18,17 @@ class CourseAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('title',)}
     inlines = [ModuleInline]
 
+@admin.register(CoursePackage)
+class CoursePackageAdmin(admin.ModelAdmin):
+    list_display = ['course', 'version', 'base_version', 'status', 'updated']
+    list_filter = ['status']
+    readonly_fields = ['course_version', 'manifest']
+
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'ref_count', 'created']
+    readonly_fields = ['name', 'ref_count', 'created']
+
 @admin.register(Appointment)
 class AppointmentAdmin(admin.ModelAdmin):
     list_display = ['instructor', 'student', 'scheduled_time', 'status']
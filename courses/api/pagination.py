@@ -1,6 +1,45 @@
-from rest_framework.pagination import PageNumberPagination      
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
 
 class StandardPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'page_size'
-    max_page_size = 50
\ No newline at end of file
+    max_page_size = 50
+
+
+class StandardCursorPagination(CursorPagination):
+    """
+    Keyset pagination: no COUNT(*) and no OFFSET, so every page costs the
+    same however deep the client walks.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+
+
+class CourseCursorPagination(StandardCursorPagination):
+    ordering = ('-created', '-id')
+
+
+class SubjectCursorPagination(StandardCursorPagination):
+    ordering = ('title', 'id')
+
+
+class CursorPaginationMixin:
+    """
+    Serve `?pagination=cursor` (and the `?cursor=` links it hands out) with
+    `cursor_pagination_class`, keeping `pagination_class` as the default.
+    """
+    cursor_pagination_class = None
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params if self.request is not None else {}
+            if self.cursor_pagination_class is not None and (
+                'cursor' in params or params.get('pagination') == 'cursor'
+            ):
+                self._paginator = self.cursor_pagination_class()
+            else:
+                return super().paginator
+        return self._paginator
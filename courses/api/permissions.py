@@ -1,6 +1,8 @@
 from rest_framework.permissions import BasePermission
 
+from courses.services.enrollment import is_enrolled
+
 
 class IsEnrolled(BasePermission):
     def has_object_permission(self, request, view, obj):
-        return obj.students.filter(id=request.user.id).exists()
\ No newline at end of file
+        return is_enrolled(request.user, obj)
\ No newline at end of file
@@ -1,18 +1,28 @@
-from django.db.models import Count
+from django.contrib.auth.models import User
+from django.db.models import Prefetch
 from rest_framework import serializers
 from courses.models import Content,Course,Module,Subject
+from courses.services import catalog, fragments
+
+
+class SubjectListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        subjects = list(data.all() if hasattr(data, 'all') else data)
+        # one windowed query for the whole page instead of one per subject
+        self.popular_courses = catalog.popular_courses([s.pk for s in subjects])
+        return super().to_representation(subjects)
 
 
 class SubjectSerializer(serializers.ModelSerializer):
-    total_courses = serializers.IntegerField()
+    total_courses = serializers.IntegerField(source='course_count', read_only=True)
     popular_courses = serializers.SerializerMethodField()
     
     def get_popular_courses(self, obj):
-        courses = obj.courses.annotate(
-            total_students = Count('students')
-        ).order_by('total_students')[:3]
-        return[
-            f'{c.title}  ({c.total_students})'for c in courses
+        popular = getattr(self.parent, 'popular_courses', None)
+        if popular is None:
+            popular = catalog.popular_courses([obj.pk])
+        return [
+            f'{title}  ({total_students})' for title, total_students in popular[obj.pk]
         ]
     
     
@@ -26,6 +36,7 @@ class SubjectSerializer(serializers.ModelSerializer):
                   'total_courses',
                   'popular_courses'
                   ]
+        list_serializer_class = SubjectListSerializer
         
 class ModuleSerializer(serializers.ModelSerializer):
     class Meta:
@@ -50,17 +61,98 @@ class CourseSerializer(serializers.ModelSerializer):
             'modules',
         ]
         
+class CourseSearchSerializer(serializers.ModelSerializer):
+    rank = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = Course
+        fields = [
+            'id',
+            'subject',
+            'title',
+            'slug',
+            'overview',
+            'created',
+            'owner',
+            'rank',
+        ]
+
+
+class EnrollmentPairSerializer(serializers.Serializer):
+    user = serializers.IntegerField(min_value=1)
+    course = serializers.IntegerField(min_value=1)
+
+
+class BulkEnrollmentSerializer(serializers.Serializer):
+    """
+    Either `{"courses": [...]}` (optionally with `"user"`, defaulting to the
+    requesting user) or `{"enrollments": [{"user": .., "course": ..}, ...]}`.
+    Ids are checked with one query per model, not one per row.
+    """
+    max_pairs = 5000
+
+    user = serializers.IntegerField(min_value=1, required=False)
+    courses = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), required=False, allow_empty=False
+    )
+    enrollments = EnrollmentPairSerializer(many=True, required=False, allow_empty=False)
+
+    def validate(self, attrs):
+        if ('courses' in attrs) == ('enrollments' in attrs):
+            raise serializers.ValidationError(
+                'Send either "courses" or "enrollments".'
+            )
+        if 'enrollments' in attrs:
+            if 'user' in attrs:
+                raise serializers.ValidationError(
+                    '"user" only applies together with "courses".'
+                )
+            pairs = {(pair['user'], pair['course']) for pair in attrs['enrollments']}
+        else:
+            user_id = attrs.get('user', self.context['request'].user.pk)
+            pairs = {(user_id, course_id) for course_id in attrs['courses']}
+        if len(pairs) > self.max_pairs:
+            raise serializers.ValidationError(
+                f'At most {self.max_pairs} enrollments per request.'
+            )
+        user_ids = {user_id for user_id, _ in pairs}
+        course_ids = {course_id for _, course_id in pairs}
+        missing_users = user_ids - set(
+            User.objects.filter(pk__in=user_ids).values_list('pk', flat=True)
+        )
+        missing_courses = course_ids - set(
+            Course.objects.filter(pk__in=course_ids).values_list('pk', flat=True)
+        )
+        errors = {}
+        if missing_users:
+            errors['users'] = f'Unknown users: {sorted(missing_users)}'
+        if missing_courses:
+            errors['courses'] = f'Unknown courses: {sorted(missing_courses)}'
+        if errors:
+            raise serializers.ValidationError(errors)
+        attrs['pairs'] = pairs
+        return attrs
+
+
 class ItemRelatedField(serializers.RelatedField):
     def to_representation(self, value):
         return value.render()
 
 
+class ContentListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        contents = list(data.all() if hasattr(data, 'all') else data)
+        fragments.prime([content.item for content in contents])
+        return super().to_representation(contents)
+
+
 class ContentSerializer(serializers.ModelSerializer):
     item = ItemRelatedField(read_only=True)
 
     class Meta:
         model = Content
         fields = ['order', 'item']
+        list_serializer_class = ContentListSerializer
         
         
         
@@ -75,6 +167,12 @@ class ModuleWithContentsSerializer(serializers.ModelSerializer):
 class CourseWithContentsSerializer(serializers.ModelSerializer):
     modules = ModuleWithContentsSerializer(many=True)
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.prefetch_related(
+            Prefetch('modules', queryset=Module.objects.with_contents())
+        )
+
     class Meta:
         model = Course
         fields = [
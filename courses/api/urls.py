@@ -1,5 +1,6 @@
 from django.urls import include, path
 from rest_framework import routers
+from rest_framework.authtoken.views import obtain_auth_token
 from .import views
 
 app_name = 'courses'
@@ -10,5 +11,6 @@ router.register('subjects', views.SubjectViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('token/', obtain_auth_token, name='token'),
     
 ]
\ No newline at end of file
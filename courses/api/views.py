@@ -1,63 +1,226 @@
-from django.db.models import Count
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+from django.http import FileResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from rest_framework import generics
+from rest_framework import generics, status
 from rest_framework import viewsets
-from rest_framework.authentication import BasicAuthentication
+from rest_framework.authentication import BasicAuthentication, TokenAuthentication
 from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from courses.api.serializers import CourseSerializer, SubjectSerializer
-from courses.models import Course, Subject
-from courses.api.pagination import StandardPagination
+from courses.api.serializers import (
+    BulkEnrollmentSerializer,
+    CourseSearchSerializer,
+    CourseSerializer,
+    SubjectSerializer,
+)
+from courses.models import Course, CoursePackage, Module, Subject
+from courses.api.pagination import (
+    CourseCursorPagination,
+    CursorPaginationMixin,
+    StandardPagination,
+    SubjectCursorPagination,
+)
 from courses.api.permissions import IsEnrolled
 from courses.api.serializers import CourseWithContentsSerializer
+from courses.services import catalog, enrollment, packages, search
     
 
 
-class SubjectViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Subject.objects.annotate(total_courses=Count('courses'))
+# Rows fetched per round trip by the NDJSON export.
+EXPORT_CHUNK_SIZE = 500
+
+
+class SubjectViewSet(CursorPaginationMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = Subject.objects.all()
     serializer_class = SubjectSerializer
     pagination_class = StandardPagination
+    cursor_pagination_class = SubjectCursorPagination
+    replica_actions = ('list', 'retrieve')
      
      
-class CourseViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Course.objects.prefetch_related('modules')
+class CourseViewSet(CursorPaginationMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = Course.objects.all()
     serializer_class = CourseSerializer
     pagination_class = StandardPagination
+    cursor_pagination_class = CourseCursorPagination
+    # actions whose reads may use the replica, see lenextra.db
+    replica_actions = ('list', 'retrieve', 'search')
+
+    # Query plan per action, applied to `queryset`. Actions that are not
+    # listed only need the course row itself (enroll, the permission check
+    # in front of the cached `contents` tree).
+    query_plans = {
+        'list': lambda queryset: queryset.prefetch_related('modules'),
+        'retrieve': lambda queryset: queryset.prefetch_related('modules'),
+        'contents_tree': CourseWithContentsSerializer.setup_eager_loading,
+    }
+
+    def get_queryset(self, plan=None):
+        queryset = super().get_queryset()
+        plan = self.query_plans.get(plan or self.action)
+        return queryset if plan is None else plan(queryset)
     
     @action(
         detail=True,
         methods=['post'],
-        authentication_classes=[BasicAuthentication],
+        authentication_classes=[TokenAuthentication, BasicAuthentication],
         permission_classes=[IsAuthenticated],
     )
     def enroll(self, request, *args, **kwargs):
         course = self.get_object()
         course.students.add(request.user)
         return Response({'enrolled': True})
+
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='bulk-enroll',
+        serializer_class=BulkEnrollmentSerializer,
+        authentication_classes=[TokenAuthentication, BasicAuthentication],
+        permission_classes=[IsAuthenticated],
+    )
+    def bulk_enroll(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        pairs = serializer.validated_data['pairs']
+        if not request.user.is_staff and any(
+            user_id != request.user.pk for user_id, _ in pairs
+        ):
+            raise PermissionDenied('Only staff can enroll other users.')
+        created = enrollment.enroll_many(pairs)
+        return Response({'enrolled': created, 'requested': len(pairs)})
      
     @action(
         detail=True,
         methods=['get'],
         serializer_class=CourseWithContentsSerializer,
-        authentication_classes=[BasicAuthentication],
+        authentication_classes=[TokenAuthentication, BasicAuthentication],
         permission_classes=[IsAuthenticated, IsEnrolled],
     )
     def contents(self, request, *args, **kwargs):
-        return self.retrieve(request, *args, **kwargs)
+        course = self.get_object()
+
+        def build(course_id):
+            # course -> modules -> contents -> items: one query per level,
+            # plus one per item model.
+            course = self.get_queryset(plan='contents_tree').get(pk=course_id)
+            return self.get_serializer(course).data
+
+        return Response(catalog.course_tree(course.pk, build))
+
+    @action(
+        detail=True,
+        methods=['get'],
+        authentication_classes=[TokenAuthentication, BasicAuthentication],
+        permission_classes=[IsAuthenticated, IsEnrolled],
+    )
+    def package(self, request, *args, **kwargs):
+        """
+        Download the offline package of the course. `?since=<version>` asks
+        for a delta from a package the client already holds. While the
+        package is being built the response is 202 and the client retries.
+        """
+        course = self.get_object()
+        try:
+            since = int(request.query_params.get('since', 0))
+        except ValueError:
+            since = 0
+        package = packages.request_package(course, since=since)
+        if package.status != CoursePackage.READY:
+            return Response(
+                {'status': package.status, 'version': package.version},
+                status=status.HTTP_202_ACCEPTED,
+                headers={'Retry-After': '10'},
+            )
+        response = FileResponse(
+            package.file.open('rb'),
+            as_attachment=True,
+            filename=package.file.name.rsplit('/', 1)[-1],
+            content_type='application/zip',
+        )
+        response['X-Package-Version'] = package.version
+        response['X-Package-Base-Version'] = package.base_version
+        return response
+
+    @action(
+        detail=False,
+        methods=['get'],
+        serializer_class=CourseSearchSerializer,
+        pagination_class=StandardPagination,
+        # ranked results have no stable key for cursors
+        cursor_pagination_class=None,
+    )
+    def search(self, request, *args, **kwargs):
+        """
+        Courses matching `?q=` in their title, overview, modules or text
+        contents, best match first. `?subject=<id>` narrows the results.
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                {'q': ['This query parameter is required.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            subject_id = int(request.query_params['subject'])
+        except KeyError:
+            subject_id = None
+        except ValueError:
+            return Response(
+                {'subject': ['A valid integer is required.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        page = self.paginate_queryset(search.search_courses(query, subject_id))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request, *args, **kwargs):
+        """
+        Stream every course with its modules as newline-delimited JSON.
+
+        Courses are read from a server-side cursor in chunks of
+        `EXPORT_CHUNK_SIZE`, with the modules of each chunk prefetched in one
+        query, so memory stays flat however large the catalog is.
+        """
+        queryset = (
+            Course.objects.order_by('pk')
+            .prefetch_related(
+                Prefetch(
+                    'modules',
+                    queryset=Module.objects.only('course_id', 'order', 'title', 'description'),
+                )
+            )
+        )
+        serializer_class = self.get_serializer_class()
+        context = self.get_serializer_context()
+
+        # A sync generator: under WSGI (uwsgi) Django would buffer an async
+        # one into memory before sending any of it.
+        def lines():
+            for course in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+                data = serializer_class(course, context=context).data
+                yield json.dumps(data, cls=DjangoJSONEncoder) + '\n'
+
+        return StreamingHttpResponse(lines(), content_type='application/x-ndjson')
     
     
     
 class SubjectDetailView(generics.RetrieveAPIView):
-    queryset = Subject.objects.annotate(total_courses=Count('courses'))
+    queryset = Subject.objects.all()
     serializer_class = SubjectSerializer
+    replica_reads = True
     
     
 
 
 class CourseEnrollView(APIView):
-     authentication_classes = [BasicAuthentication]
+     authentication_classes = [TokenAuthentication, BasicAuthentication]
      permission_classes = [IsAuthenticated]
      def post(self, request, pk, format=None):
           course = get_object_or_404(Course, pk=pk)
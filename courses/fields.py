@@ -1,23 +1,121 @@
 from django.core.exceptions import ObjectDoesNotExist
-from django.db import models
+from django.db import connection, models
+from django.db.models.functions import Coalesce
+
 
 class OrderField(models.PositiveIntegerField):
-    def __init__(self, for_fields=None, *args, **kwargs):
+    """
+    Ordering column scoped by `for_fields`.
+
+    With `gap` set, keys are sparse: new rows are appended at the current
+    maximum plus `gap` (computed inside the INSERT itself), and `move()`
+    places a row between its new neighbours by rewriting that row only.
+    `rebalance()` spreads the keys out again once two neighbours touch.
+    """
+
+    def __init__(self, for_fields=None, gap=None, *args, **kwargs):
         self.for_fields = for_fields
+        self.gap = gap
         super().__init__(*args, **kwargs)
 
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.gap is not None:
+            kwargs['gap'] = self.gap
+        return name, path, args, kwargs
+
+    @property
+    def db_returning(self):
+        # Appended keys are computed by the database, read them back.
+        return self.gap is not None and connection.features.can_return_columns_from_insert
+
+    def siblings(self, model_instance):
+        qs = self.model.objects.all()
+        if self.for_fields:
+            query = {
+                field: getattr(model_instance, self.model._meta.get_field(field).attname)
+                for field in self.for_fields
+            }
+            qs = qs.filter(**query)
+        return qs
+
     def pre_save(self, model_instance, add):
         if getattr(model_instance, self.attname) is None:
-            try:
-                qs = self.model.objects.all()
-                if self.for_fields:
-                    query = {field: getattr(model_instance, field) for field in self.for_fields}
-                    qs = qs.filter(**query)
-                last_item = qs.latest(self.attname)
-                value = last_item.order + 1
-            except ObjectDoesNotExist:
-                value = 0
+            if self.gap is not None:
+                value = self._next_sparse_value(model_instance)
+            else:
+                try:
+                    qs = self.siblings(model_instance)
+                    last_item = qs.latest(self.attname)
+                    value = last_item.order + 1
+                except ObjectDoesNotExist:
+                    value = 0
             setattr(model_instance, self.attname, value)
             return value
         else:
-            return super().pre_save(model_instance, add)
\ No newline at end of file
+            return super().pre_save(model_instance, add)
+
+    def _next_sparse_value(self, model_instance):
+        last = self.siblings(model_instance).order_by(f'-{self.attname}').values(self.attname)[:1]
+        if self.db_returning:
+            return Coalesce(
+                models.Subquery(last) + self.gap,
+                0,
+                output_field=models.PositiveIntegerField(),
+            )
+        value = last.first()
+        return 0 if value is None else value[self.attname] + self.gap
+
+    def move(self, model_instance, after=None):
+        """
+        Place `model_instance` right after `after`, or first when `after` is
+        None. Only the moved row is written unless the keys around the new
+        position have run out of room, in which case the siblings are
+        rebalanced first.
+        """
+        for _ in range(2):
+            value = self._value_after(model_instance, after)
+            if value is not None:
+                break
+            self.rebalance(model_instance)
+            if after is not None:
+                after.refresh_from_db(fields=[self.attname])
+        self.model.objects.filter(pk=model_instance.pk).update(**{self.attname: value})
+        setattr(model_instance, self.attname, value)
+        return value
+
+    def _value_after(self, model_instance, after):
+        others = self.siblings(model_instance).exclude(pk=model_instance.pk)
+        gap = self.gap or 1
+        if after is None:
+            lower = None
+            upper = others.order_by(self.attname).values_list(self.attname, flat=True).first()
+        else:
+            lower = getattr(after, self.attname)
+            upper = (
+                others.filter(**{f'{self.attname}__gt': lower})
+                .order_by(self.attname)
+                .values_list(self.attname, flat=True)
+                .first()
+            )
+        if upper is None:
+            return 0 if lower is None else lower + gap
+        if lower is None:
+            lower = -1
+        if upper - lower > 1:
+            return (lower + upper) // 2
+        return None
+
+    def rebalance(self, model_instance):
+        """
+        Renumber all siblings of `model_instance` to multiples of `gap` in a
+        single statement, keeping their current order.
+        """
+        siblings = list(
+            self.siblings(model_instance).order_by(self.attname, 'pk').only('pk', self.attname)
+        )
+        # Start one gap in, so there is room to move a row to the front.
+        for index, obj in enumerate(siblings, start=1):
+            setattr(obj, self.attname, index * (self.gap or 1))
+        self.model.objects.bulk_update(siblings, [self.attname])
+        return len(siblings)
@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from courses.services import uploads
+
+
+class Command(BaseCommand):
+    help = 'Delete chunked upload sessions that have not been written to recently.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=int(uploads.SESSION_TIMEOUT.total_seconds() // 3600),
+            help='Age in hours after which a session is removed.',
+        )
+
+    def handle(self, *args, hours, **options):
+        count = uploads.clear_stale(timedelta(hours=hours))
+        self.stdout.write(self.style.SUCCESS(f'Removed {count} upload sessions.'))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from courses.services import blobs
+
+
+class Command(BaseCommand):
+    help = 'Delete media blobs no File or Image uses any more.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recount',
+            action='store_true',
+            help='Rebuild the reference counts from File and Image rows first.',
+        )
+        parser.add_argument(
+            '--migrate-legacy',
+            action='store_true',
+            help='Move files uploaded before blob storage into blobs first.',
+        )
+
+    def handle(self, *args, recount=False, migrate_legacy=False, **options):
+        if migrate_legacy:
+            moved = sum(blobs.migrate_legacy(model) for model in blobs.BLOB_MODELS)
+            self.stdout.write(f'Moved {moved} files into blob storage.')
+        if recount:
+            total = blobs.recount()
+            self.stdout.write(f'Recounted {total} blobs.')
+        count = blobs.collect()
+        self.stdout.write(self.style.SUCCESS(f'Removed {count} orphaned blobs.'))
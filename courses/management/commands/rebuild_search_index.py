@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from courses.services import search
+
+
+class Command(BaseCommand):
+    help = 'Recompute the full-text search vector of every course.'
+
+    def handle(self, *args, **options):
+        count = search.update_courses()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} courses.'))
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from courses.models import Course, Subject
+from courses.services import catalog, counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute Course.module_count/student_count and Subject.course_count.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many rows have drifted.',
+        )
+
+    def handle(self, *args, dry_run=False, **options):
+        actual = counters.actual_course_counts()
+        drifted_courses = dict(
+            Course.objects.annotate(
+                actual_modules=actual['module_count'],
+                actual_students=actual['student_count'],
+            )
+            .exclude(
+                module_count=F('actual_modules'),
+                student_count=F('actual_students'),
+            )
+            .values_list('pk', 'subject_id')
+        )
+        drifted_subjects = list(
+            Subject.objects.annotate(
+                actual_courses=counters.actual_subject_counts()['course_count']
+            )
+            .exclude(course_count=F('actual_courses'))
+            .values_list('pk', flat=True)
+        )
+        self.stdout.write(
+            f'Drifted: {len(drifted_courses)} courses, {len(drifted_subjects)} subjects.'
+        )
+        if dry_run or not (drifted_courses or drifted_subjects):
+            return
+        with transaction.atomic():
+            counters.recount_courses(list(drifted_courses))
+            counters.recount_subjects(drifted_subjects)
+        for subject_id in set(drifted_courses.values()) | set(drifted_subjects):
+            catalog.invalidate_subject(subject_id)
+        self.stdout.write(self.style.SUCCESS('Counters repaired.'))
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:46
+
+import courses.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_course_students'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='content',
+            name='order',
+            field=courses.fields.OrderField(blank=True, gap=1024),
+        ),
+        migrations.AlterField(
+            model_name='module',
+            name='order',
+            field=courses.fields.OrderField(blank=True, gap=1024),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:48
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('*'))
+            .values('total')
+        ),
+        0,
+    )
+
+
+def backfill_counters(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    Module = apps.get_model('courses', 'Module')
+    Subject = apps.get_model('courses', 'Subject')
+    Course.objects.update(
+        module_count=_count(Module.objects.all(), 'course'),
+        student_count=_count(Course.students.through.objects.all(), 'course'),
+    )
+    Subject.objects.update(course_count=_count(Course.objects.all(), 'subject'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_sparse_order_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='module_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='student_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='subject',
+            name='course_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+import lenextra.storage
+
+
+def move_packages(apps, schema_editor):
+    # Package files built so far sit under MEDIA_ROOT, where anyone can
+    # download them: move them to the private storage under the same name.
+    CoursePackage = apps.get_model('courses', 'CoursePackage')
+    private = lenextra.storage.get_private_storage()
+    for package in CoursePackage.objects.exclude(file=''):
+        name = package.file.name
+        if not default_storage.exists(name):
+            continue
+        with default_storage.open(name, 'rb') as src:
+            saved = private.save(name, src)
+        default_storage.delete(name)
+        if saved != name:
+            CoursePackage.objects.filter(pk=package.pk).update(file=saved)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0012_course_search_vector'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='coursepackage',
+            name='file',
+            field=models.FileField(blank=True, storage=lenextra.storage.get_private_storage, upload_to='course_packages'),
+        ),
+        migrations.RunPython(move_packages, migrations.RunPython.noop),
+    ]
@@ -1,13 +1,61 @@
+import uuid
+
 from django.contrib.auth.models import User
 
-from django.db import models
-from django.template.loader import render_to_string
+from django.db import DatabaseError, models
 from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from .fields import OrderField
+from .services import fragments
+from .storage import blob_storage
 from django.conf import settings
-class Subject(models.Model):
+from lenextra import derivatives as image_derivatives
+from lenextra.storage import get_private_storage
+
+# Spacing between sparse order keys of modules and contents.
+ORDER_GAP = 1024
+
+
+class CounterFieldsMixin:
+    """
+    Leave denormalized counters out of regular saves of an existing row, so
+    a stale instance never overwrites the F() increments made by signals.
+    Instances loaded without their counters already save without them.
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        deferred = self.get_deferred_fields()
+        if (
+            not self._state.adding
+            and kwargs.get('update_fields') is None
+            and any(name not in deferred for name in self.counter_fields)
+        ):
+            update_fields = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+                and field.attname not in deferred
+            ]
+            try:
+                super().save(*args, **{**kwargs, 'update_fields': update_fields})
+                return
+            except DatabaseError as error:
+                # only Django's own "did not affect any rows", not a failed query
+                if type(error) is not DatabaseError or type(self)._base_manager.filter(pk=self.pk).exists():
+                    raise
+                # the row is gone: insert it again, as a plain save would
+        super().save(*args, **kwargs)
+
+
+class Subject(CounterFieldsMixin, models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(max_length=200, unique=True)
+    course_count = models.PositiveIntegerField(default=0, editable=False)
+
+    counter_fields = ('course_count',)
 
     class Meta:
         ordering = ['title']
@@ -15,7 +63,7 @@ class Subject(models.Model):
     def __str__(self):
         return self.title
     
-class Course(models.Model):
+class Course(CounterFieldsMixin, models.Model):
     owner = models.ForeignKey(User, related_name='courses_created', on_delete=models.CASCADE)
     subject = models.ForeignKey(Subject, related_name='courses', on_delete=models.CASCADE)
     title = models.CharField(max_length=200)
@@ -25,19 +73,41 @@ class Course(models.Model):
     students = models.ManyToManyField(User, 
                                       related_name='courses_joined',
                                       blank=True)
+    # Maintained by courses.signals, repaired by `repair_catalog_counters`.
+    module_count = models.PositiveIntegerField(default=0, editable=False)
+    student_count = models.PositiveIntegerField(default=0, editable=False)
+
+    counter_fields = ('module_count', 'student_count')
+    # Maintained by courses.services.search, rebuilt by `rebuild_search_index`.
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='course_search_vector_gin'),
+        ]
 
     def __str__(self):
         return self.title
     
     
+class ModuleQuerySet(models.QuerySet):
+    def with_contents(self):
+        """
+        Prefetch each module's contents together with their items.
+        """
+        return self.prefetch_related(
+            models.Prefetch('contents', queryset=Content.objects.with_items())
+        )
+
+
 class Module(models.Model):
     course = models.ForeignKey(Course, related_name='modules', on_delete=models.CASCADE)
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
-    order = OrderField(blank=True, for_fields=['course'])
+    order = OrderField(blank=True, for_fields=['course'], gap=ORDER_GAP)
+
+    objects = ModuleQuerySet.as_manager()
 
     class Meta:
         
@@ -46,14 +116,24 @@ class Module(models.Model):
     def __str__(self):
         return f'{self.order}. {self.title}'
     
+class ContentQuerySet(models.QuerySet):
+    def with_items(self):
+        """
+        Resolve the generic `item` of every content with one query per
+        content type (Text, Video, Image, File) instead of one per row.
+        """
+        return self.prefetch_related('item')
+
+
 class Content(models.Model):
     module = models.ForeignKey(Module, related_name='contents', on_delete=models.CASCADE)
     content_type = models.ForeignKey('contenttypes.ContentType', on_delete=models.CASCADE,
                                      limit_choices_to={'model__in': ('text', 'video', 'image', 'file')})
     object_id = models.PositiveIntegerField()
     item = GenericForeignKey('content_type', 'object_id')
-    order = OrderField(blank=True, for_fields=['module'])
-    
+    order = OrderField(blank=True, for_fields=['module'], gap=ORDER_GAP)
+
+    objects = ContentQuerySet.as_manager()
 
     class Meta:
         ordering = ['order']
@@ -74,10 +154,9 @@ class ItemBase(models.Model):
         return self.title
     
     def render(self):
-        return render_to_string(
-            f'courses/content/{self._meta.model_name}.html',
-            {'item': self},
-        )
+        if '_rendered' not in self.__dict__:
+            fragments.prime([self])
+        return self._rendered
     
     
     
@@ -86,15 +165,108 @@ class Text(ItemBase):
     content = models.TextField()    
     
 class File(ItemBase):
-    file = models.FileField(upload_to='files')
+    file = models.FileField(upload_to='files', storage=blob_storage)
     
 class Image(ItemBase):
-    file = models.FileField(upload_to='images')
+    file = models.FileField(upload_to='images', storage=blob_storage)
+    # Resized variants, written by a background job after each upload.
+    derivatives = models.JSONField(default=dict, blank=True, editable=False)
+
+    def srcsets(self):
+        return image_derivatives.srcsets(self.derivatives, self.file.url)
     
 class Video(ItemBase):
     url = models.URLField()
 
 
+class MediaBlob(models.Model):
+    """
+    A file in `blob_storage` and the number of File and Image rows using it.
+    Maintained by courses.signals, repaired by `collect_media_blobs`.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    ref_count = models.PositiveIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.name} ({self.ref_count})'
+
+
+class UploadSession(models.Model):
+    """
+    A resumable upload of a File or Image item. Chunks are appended to a part
+    file in `settings.CHUNKED_UPLOAD_DIR`; once `offset` reaches `size` the
+    file is verified and attached to the item.
+    """
+    OPEN = 'open'
+    COMPLETE = 'complete'
+    STATUS_CHOICES = [
+        (OPEN, 'Open'),
+        (COMPLETE, 'Complete'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(User, related_name='upload_sessions', on_delete=models.CASCADE)
+    module = models.ForeignKey(Module, related_name='upload_sessions', on_delete=models.CASCADE)
+    content_type = models.ForeignKey('contenttypes.ContentType', on_delete=models.CASCADE,
+                                     limit_choices_to={'model__in': ('image', 'file')})
+    # The item being replaced, or the created item once complete.
+    object_id = models.PositiveIntegerField(null=True, blank=True)
+    title = models.CharField(max_length=250)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    sha256 = models.CharField(max_length=64, blank=True)
+    offset = models.PositiveBigIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=OPEN)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.filename} ({self.offset}/{self.size})'
+
+
+class CoursePackage(models.Model):
+    """
+    A zip of a course for offline use: rendered content, File and Image
+    media and a manifest. Full packages have `base_version` 0; a delta holds
+    only the contents that changed since package `base_version`.
+    """
+    PENDING = 'pending'
+    READY = 'ready'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (READY, 'Ready'),
+        (FAILED, 'Failed'),
+    ]
+
+    course = models.ForeignKey(Course, related_name='packages', on_delete=models.CASCADE)
+    version = models.PositiveIntegerField()
+    base_version = models.PositiveIntegerField(default=0)
+    # The 'course' cache version the package was built from.
+    course_version = models.BigIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    # Served only by the enrollment-checked API action, never from /media/.
+    file = models.FileField(upload_to='course_packages', storage=get_private_storage, blank=True)
+    manifest = models.JSONField(default=dict, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-version']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['course', 'version', 'base_version'],
+                name='unique_course_package',
+            ),
+        ]
+
+    def __str__(self):
+        if self.base_version:
+            return f'{self.course} v{self.base_version}..v{self.version}'
+        return f'{self.course} v{self.version}'
+
+
 from django.conf import settings
 
 class InstructorProfile(models.Model):
@@ -0,0 +1,122 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from courses.models import File, Image, MediaBlob
+from courses.storage import BLOB_DIR, blob_storage
+from lenextra import derivatives
+
+BLOB_MODELS = (File, Image)
+
+
+def acquire(name, count=1):
+    """
+    Count `count` more File or Image rows using blob `name`.
+    """
+    if not name or not blob_storage.is_blob(name):
+        return
+    if MediaBlob.objects.filter(name=name).update(ref_count=F('ref_count') + count):
+        return
+    try:
+        with transaction.atomic():
+            MediaBlob.objects.create(name=name, ref_count=count)
+    except IntegrityError:
+        # created by a concurrent upload of the same bytes
+        MediaBlob.objects.filter(name=name).update(ref_count=F('ref_count') + count)
+
+
+def release(name):
+    """
+    Count one row less using blob `name`. The last release deletes the blob
+    once the transaction commits.
+    """
+    if not name or not blob_storage.is_blob(name):
+        return
+    MediaBlob.objects.filter(name=name, ref_count__gt=0).update(
+        ref_count=F('ref_count') - 1
+    )
+    transaction.on_commit(lambda: collect([name]))
+
+
+def collect(names=None):
+    """
+    Delete unreferenced blobs, or only those among `names`. The row is locked
+    while its file is removed, so an upload of the same bytes waits for it.
+    """
+    orphans = MediaBlob.objects.filter(ref_count=0)
+    if names is not None:
+        orphans = orphans.filter(name__in=names)
+    count = 0
+    for pk in orphans.values_list('pk', flat=True):
+        with transaction.atomic():
+            blob = MediaBlob.objects.select_for_update().filter(pk=pk, ref_count=0).first()
+            if blob is None:
+                continue
+            blob_storage.delete(blob.name)
+            derivatives.delete(blob.name)
+            blob.delete()
+            count += 1
+    return count
+
+
+def recount():
+    """
+    Rebuild every MediaBlob from the File and Image rows.
+    """
+    counts = {}
+    for model in BLOB_MODELS:
+        rows = (
+            model.objects.exclude(file='')
+            .order_by()
+            .values_list('file')
+            .annotate(total=Count('*'))
+        )
+        for name, total in rows:
+            if blob_storage.is_blob(name):
+                counts[name] = counts.get(name, 0) + total
+    with transaction.atomic():
+        MediaBlob.objects.exclude(name__in=counts).update(ref_count=0)
+        existing = {
+            blob.name: blob
+            for blob in MediaBlob.objects.select_for_update().filter(name__in=counts)
+        }
+        changed = []
+        for name, total in counts.items():
+            blob = existing.get(name)
+            if blob is None:
+                MediaBlob.objects.create(name=name, ref_count=total)
+            elif blob.ref_count != total:
+                blob.ref_count = total
+                changed.append(blob)
+        MediaBlob.objects.bulk_update(changed, ['ref_count'])
+    return len(counts)
+
+
+def migrate_legacy(model):
+    """
+    Move the files of `model` rows saved before blob storage into blobs.
+    Returns the number of rows moved.
+    """
+    moved = 0
+    names = (
+        model.objects.exclude(file='')
+        .exclude(file__startswith=f'{BLOB_DIR}/')
+        .order_by()
+        .values_list('file', flat=True)
+        .distinct()
+    )
+    for old_name in list(names):
+        if not blob_storage.exists(old_name):
+            continue
+        with transaction.atomic():
+            with blob_storage.open(old_name, 'rb') as fp:
+                new_name = blob_storage.save(old_name, fp)
+            for item in model.objects.filter(file=old_name):
+                item.file.name = new_name
+                # the signals count the blob and refresh the rendered fragment
+                item.save(update_fields=['file', 'updated'])
+                moved += 1
+        # rows copied from one another share the legacy file: remove it only
+        # once none of them refers to it
+        if not any(m.objects.filter(file=old_name).exists() for m in BLOB_MODELS):
+            blob_storage.delete(old_name)
+    return moved
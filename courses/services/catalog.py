@@ -0,0 +1,184 @@
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from courses.models import Course, Module, Subject
+from lenextra.db import use_primary
+from .versions import aget_version, bump_version_on_commit, get_version
+
+CATALOG_TIMEOUT = 60 * 60
+ALL = 'all'
+# Needs a `total_modules` annotation on the queryset.
+COURSE_ROW_FIELDS = (
+    'id',
+    'title',
+    'slug',
+    'total_modules',
+    'subject_id',
+    'subject__title',
+    'subject__slug',
+    'owner__first_name',
+    'owner__last_name',
+)
+
+
+def _owner_name(row):
+    return f"{row['owner__first_name']} {row['owner__last_name']}".strip()
+
+
+def course_row(row):
+    """
+    Shape a `COURSE_ROW_FIELDS` values() row like the cached catalog rows.
+    """
+    return {
+        'id': row['id'],
+        'title': row['title'],
+        'slug': row['slug'],
+        'total_modules': row['total_modules'],
+        'owner_name': _owner_name(row),
+        'subject': {
+            'id': row['subject_id'],
+            'title': row['subject__title'],
+            'slug': row['subject__slug'],
+        },
+    }
+
+
+def _subject_rows_query():
+    return Subject.objects.annotate(total_courses=F('course_count')).values(
+        'id', 'title', 'slug', 'total_courses'
+    )
+
+
+def _course_rows_query(subject_id=None):
+    qs = Course.objects.annotate(total_modules=F('module_count'))
+    if subject_id is not None:
+        qs = qs.filter(subject_id=subject_id)
+    return qs.values(*COURSE_ROW_FIELDS)
+
+
+def _outline_query(course_id):
+    return Course.objects.filter(pk=course_id).values('id', 'title', 'slug')
+
+
+def _outline_modules_query(course_id):
+    return Module.objects.filter(course_id=course_id).values('id', 'title', 'order')
+
+
+async def asubject_rows():
+    """
+    Pre-serialized subjects with their `total_courses` count.
+    """
+    key = f"catalog:subjects:{await aget_version('catalog', ALL)}"
+    rows = await cache.aget(key)
+    if rows is None:
+        with use_primary():
+            rows = [row async for row in _subject_rows_query()]
+        await cache.aset(key, rows, CATALOG_TIMEOUT)
+    return rows
+
+
+async def acourse_rows(subject_id=None):
+    """
+    Pre-serialized courses with their `total_modules` count, either for the
+    whole catalog or for a single subject.
+    """
+    if subject_id is None:
+        key = f"catalog:courses:{await aget_version('catalog', ALL)}"
+    else:
+        version = await aget_version('catalog_subject', subject_id)
+        key = f'catalog:subject:{subject_id}:courses:{version}'
+    rows = await cache.aget(key)
+    if rows is None:
+        with use_primary():
+            rows = [course_row(row) async for row in _course_rows_query(subject_id)]
+        await cache.aset(key, rows, CATALOG_TIMEOUT)
+    return rows
+
+
+async def acourse_outline(course_id):
+    """
+    The course title and its ordered module list, shared by every student
+    of the course. Returns None when the course does not exist.
+    """
+    version = await aget_version('course', course_id)
+    key = f'catalog:course:{course_id}:outline:{version}'
+    outline = await cache.aget(key)
+    if outline is None:
+        with use_primary():
+            outline = await _outline_query(course_id).afirst()
+            if outline is None:
+                return None
+            outline['modules'] = [row async for row in _outline_modules_query(course_id)]
+        await cache.aset(key, outline, CATALOG_TIMEOUT)
+    return outline
+
+
+def course_tree(course_id, build):
+    """
+    The fully serialized module/content tree of a course, as returned by
+    `build(course_id)`. Any change to the course, its modules, contents or
+    items bumps the course version and so rebuilds the tree.
+    """
+    key = f"catalog:course:{course_id}:tree:{get_version('course', course_id)}"
+    tree = cache.get(key)
+    if tree is None:
+        with use_primary():
+            tree = build(course_id)
+        cache.set(key, tree, CATALOG_TIMEOUT)
+    return tree
+
+
+def popular_courses(subject_ids, limit=3):
+    """
+    Top `limit` courses by enrolled students for each subject, computed for
+    all subjects at once with ROW_NUMBER() OVER (PARTITION BY subject).
+    Returns {subject_id: [(title, total_students), ...]}.
+    """
+    ranked = (
+        Course.objects.filter(subject_id__in=subject_ids)
+        .annotate(
+            position=Window(
+                RowNumber(),
+                partition_by=F('subject_id'),
+                order_by=[F('student_count').desc(), F('id')],
+            ),
+        )
+        .filter(position__lte=limit)
+        .order_by('subject_id', 'position')
+        .values_list('subject_id', 'title', 'student_count')
+    )
+    courses = defaultdict(list)
+    for subject_id, title, total_students in ranked:
+        courses[subject_id].append((title, total_students))
+    return courses
+
+
+def invalidate_subject(subject_id):
+    """
+    Expire the catalog rows of one subject and the catalog-wide listings,
+    once the current transaction commits.
+    """
+    if subject_id is not None:
+        bump_version_on_commit('catalog_subject', subject_id)
+    bump_version_on_commit('catalog', ALL)
+
+
+def invalidate_course(course_id):
+    """
+    Expire the cached outline and content tree of a course on commit.
+    """
+    bump_version_on_commit('course', course_id)
+
+
+def invalidate_modules(module_ids):
+    """
+    Expire the cached bodies of the given modules and the trees of their
+    courses on commit.
+    """
+    rows = Module.objects.filter(pk__in=set(module_ids)).values_list('pk', 'course_id')
+    for module_id, course_id in rows:
+        bump_version_on_commit('module', module_id)
+        invalidate_course(course_id)
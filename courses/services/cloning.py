@@ -0,0 +1,93 @@
+from collections import Counter, defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+
+from courses.models import Content, Course, Module
+from . import blobs, catalog, counters, search
+
+
+def _clone_items(contents, owner):
+    """
+    Copy the items behind `contents` for `owner`, with one SELECT and one
+    INSERT per item model. Returns {(content_type_id, old_id): new_id}.
+    """
+    object_ids = defaultdict(set)
+    for content in contents:
+        object_ids[content.content_type_id].add(content.object_id)
+
+    new_ids = {}
+    for content_type_id, ids in object_ids.items():
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+        items = list(model.objects.filter(pk__in=ids))
+        old_ids = [item.pk for item in items]
+        for item in items:
+            item.pk = None
+            item.owner = owner
+            item._state.adding = True
+        model.objects.bulk_create(items)
+        for old_id, item in zip(old_ids, items):
+            new_ids[content_type_id, old_id] = item.pk
+        if model in blobs.BLOB_MODELS:
+            # bulk_create sends no post_save, count the shared blobs here
+            for name, count in Counter(item.file.name for item in items).items():
+                blobs.acquire(name, count)
+    return new_ids
+
+
+def clone_course(source, owner, **fields):
+    """
+    Copy `source` with its modules, contents and items for `owner`, keeping
+    every order value. Course fields in `fields` (a new slug at least)
+    override the copied ones. Everything is written in one transaction, with
+    one INSERT per model instead of one per row.
+    """
+    with transaction.atomic():
+        course = Course(
+            owner=owner,
+            subject_id=source.subject_id,
+            title=source.title,
+            overview=source.overview,
+        )
+        for name, value in fields.items():
+            setattr(course, name, value)
+        course.save()
+
+        modules = list(Module.objects.filter(course=source).order_by('order', 'pk'))
+        copies = Module.objects.bulk_create(
+            [
+                Module(
+                    course=course,
+                    title=module.title,
+                    description=module.description,
+                    order=module.order,
+                )
+                for module in modules
+            ]
+        )
+        module_ids = {module.pk: copy.pk for module, copy in zip(modules, copies)}
+
+        contents = list(
+            Content.objects.filter(module__course=source).order_by('module_id', 'order', 'pk')
+        )
+        item_ids = _clone_items(contents, owner)
+        Content.objects.bulk_create(
+            [
+                Content(
+                    module_id=module_ids[content.module_id],
+                    content_type_id=content.content_type_id,
+                    object_id=item_ids[content.content_type_id, content.object_id],
+                    order=content.order,
+                )
+                for content in contents
+                # skip contents whose item was deleted
+                if (content.content_type_id, content.object_id) in item_ids
+            ]
+        )
+
+        # bulk_create bypasses the signals keeping these current
+        counters.add_modules(course.pk, len(copies))
+        search.update_courses([course.pk])
+        catalog.invalidate_subject(course.subject_id)
+        catalog.invalidate_course(course.pk)
+    return course
@@ -0,0 +1,57 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from courses.models import Course, Module, Subject
+
+
+def _count(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('*'))
+            .values('total')
+        ),
+        0,
+    )
+
+
+def actual_course_counts():
+    """
+    Expressions computing the true module and student counts of a course.
+    """
+    return {
+        'module_count': _count(Module.objects.all(), 'course'),
+        'student_count': _count(Course.students.through.objects.all(), 'course'),
+    }
+
+
+def actual_subject_counts():
+    return {'course_count': _count(Course.objects.all(), 'subject')}
+
+
+def recount_courses(course_ids=None):
+    qs = Course.objects.all()
+    if course_ids is not None:
+        qs = qs.filter(pk__in=course_ids)
+    return qs.update(**actual_course_counts())
+
+
+def recount_subjects(subject_ids=None):
+    qs = Subject.objects.all()
+    if subject_ids is not None:
+        qs = qs.filter(pk__in=subject_ids)
+    return qs.update(**actual_subject_counts())
+
+
+def add_modules(course_id, delta):
+    Course.objects.filter(pk=course_id).update(module_count=F('module_count') + delta)
+
+
+def add_students(course_ids, delta):
+    Course.objects.filter(pk__in=course_ids).update(student_count=F('student_count') + delta)
+
+
+def add_courses(subject_id, delta):
+    Subject.objects.filter(pk=subject_id).update(course_count=F('course_count') + delta)
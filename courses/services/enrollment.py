@@ -0,0 +1,105 @@
+from django.core.cache import cache
+from django.db import transaction
+
+from courses.models import Course
+from courses.services import counters
+from lenextra.db import use_primary
+
+ENROLLMENT_TIMEOUT = 60 * 60
+
+
+def _enrollment_key(user_id):
+    return f'enrollment:user:{user_id}'
+
+
+def enrolled_course_ids(user):
+    """
+    Return the frozenset of course IDs the user is enrolled in.
+
+    The set is cached per user and dropped by the m2m_changed receiver on
+    Course.students, so every gated request resolves membership from memory.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    key = _enrollment_key(user.pk)
+    course_ids = cache.get(key)
+    if course_ids is None:
+        with use_primary():
+            course_ids = frozenset(
+                Course.students.through.objects.filter(user_id=user.pk).values_list(
+                    'course_id', flat=True
+                )
+            )
+        cache.set(key, course_ids, ENROLLMENT_TIMEOUT)
+    return course_ids
+
+
+async def aenrolled_course_ids(user):
+    """
+    Async version of enrolled_course_ids().
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    key = _enrollment_key(user.pk)
+    course_ids = await cache.aget(key)
+    if course_ids is None:
+        with use_primary():
+            course_ids = frozenset(
+                [
+                    course_id
+                    async for course_id in Course.students.through.objects.filter(
+                        user_id=user.pk
+                    ).values_list('course_id', flat=True)
+                ]
+            )
+        await cache.aset(key, course_ids, ENROLLMENT_TIMEOUT)
+    return course_ids
+
+
+def is_enrolled(user, course):
+    """
+    Membership check against the cached index; `course` may be a Course or an id.
+    """
+    course_id = getattr(course, 'pk', course)
+    return course_id in enrolled_course_ids(user)
+
+
+async def ais_enrolled(user, course):
+    course_id = getattr(course, 'pk', course)
+    return course_id in await aenrolled_course_ids(user)
+
+
+def invalidate(user_ids):
+    cache.delete_many([_enrollment_key(user_id) for user_id in user_ids])
+
+
+def enroll_many(pairs):
+    """
+    Enroll many `(user_id, course_id)` pairs with one INSERT.
+
+    bulk_create() sends no m2m_changed, so the enrollment caches and the
+    student counters the receivers would have maintained are updated here.
+    Returns the number of pairs that were not enrolled before.
+    """
+    pairs = set(pairs)
+    if not pairs:
+        return 0
+    Enrollment = Course.students.through
+    user_ids = {user_id for user_id, _ in pairs}
+    course_ids = {course_id for _, course_id in pairs}
+    existing = set(
+        Enrollment.objects.filter(user_id__in=user_ids, course_id__in=course_ids)
+        .values_list('user_id', 'course_id')
+    )
+    new_pairs = pairs - existing
+    if not new_pairs:
+        return 0
+    with transaction.atomic():
+        Enrollment.objects.bulk_create(
+            [Enrollment(user_id=user_id, course_id=course_id) for user_id, course_id in new_pairs],
+            ignore_conflicts=True,
+        )
+        # recount rather than add: a concurrent enroll may have won a row
+        counters.recount_courses({course_id for _, course_id in new_pairs})
+    invalidate({user_id for user_id, _ in new_pairs})
+    return len(new_pairs)
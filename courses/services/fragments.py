@@ -0,0 +1,51 @@
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+# Bump when the courses/content/*.html templates change.
+FRAGMENT_VERSION = 2
+
+
+def fragment_key(item):
+    updated = int(item.updated.timestamp() * 1_000_000)
+    return (
+        f'fragment:v{FRAGMENT_VERSION}:{item._meta.label_lower}:'
+        f'{item.pk}:{updated}'
+    )
+
+
+def render_fragment(item):
+    return render_to_string(
+        f'courses/content/{item._meta.model_name}.html',
+        {'item': item},
+    )
+
+
+def store(item):
+    html = render_fragment(item)
+    cache.set(fragment_key(item), html, FRAGMENT_TIMEOUT)
+    item._rendered = mark_safe(html)
+    return item._rendered
+
+
+def prime(items):
+    """
+    Attach the rendered HTML to every item, reading all fragments with a
+    single get_many and rendering only the ones missing from the store.
+    """
+    pending = {}
+    for item in items:
+        if item is not None and '_rendered' not in item.__dict__:
+            pending[fragment_key(item)] = item
+    if not pending:
+        return
+    found = cache.get_many(pending)
+    missing = {}
+    for key, item in pending.items():
+        html = found.get(key)
+        if html is None:
+            html = missing[key] = render_fragment(item)
+        item._rendered = mark_safe(html)
+    if missing:
+        cache.set_many(missing, FRAGMENT_TIMEOUT)
@@ -0,0 +1,297 @@
+import hashlib
+import json
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+
+from django.core.files import File as DjangoFile
+from django.db import IntegrityError, transaction
+from django.db.models import Max, Prefetch, Q
+from django.utils import timezone
+
+from courses.models import Content, CoursePackage, Module
+from lenextra.background import run_in_background
+from . import fragments
+from .versions import get_version
+
+MANIFEST_NAME = 'manifest.json'
+# Full packages kept per course; deltas are only built against these.
+KEEP_PACKAGES = 3
+# A pending package older than this lost its job and is scheduled again.
+BUILD_TIMEOUT = timedelta(minutes=10)
+
+
+def request_package(course, since=None):
+    """
+    Return the package a client should download for the current state of
+    `course`: a delta from package version `since` when that package is still
+    available, the full package otherwise. The returned package may still be
+    pending, its build is scheduled in the background.
+    """
+    full = _current_full_package(course)
+    if full.status != CoursePackage.READY or not since or since >= full.version:
+        return full
+    base = CoursePackage.objects.filter(
+        course=course, version=since, base_version=0, status=CoursePackage.READY
+    ).first()
+    if base is None:
+        return full
+    delta, _ = _get_or_schedule(course, full.version, since, full.course_version)
+    return delta
+
+
+def _current_full_package(course):
+    course_version = get_version('course', course.pk)
+    package = (
+        CoursePackage.objects.filter(course=course, base_version=0)
+        .exclude(status=CoursePackage.FAILED)
+        .first()
+    )
+    if package is not None and package.course_version == course_version:
+        if package.status == CoursePackage.PENDING:
+            _reschedule_if_stale(package)
+        return package
+    if package is not None and package.status == CoursePackage.PENDING:
+        # An unfinished build of an older version: rebuild it as current.
+        # Only the request whose UPDATE matches the old version schedules it.
+        claimed = CoursePackage.objects.filter(
+            pk=package.pk,
+            status=CoursePackage.PENDING,
+            course_version=package.course_version,
+        ).update(course_version=course_version, updated=timezone.now())
+        package.course_version = course_version
+        if claimed:
+            run_in_background(build_package, package.pk)
+        return package
+    latest = CoursePackage.objects.filter(course=course).aggregate(v=Max('version'))['v']
+    package, _ = _get_or_schedule(course, (latest or 0) + 1, 0, course_version)
+    return package
+
+
+def _get_or_schedule(course, version, base_version, course_version):
+    try:
+        with transaction.atomic():
+            package, created = CoursePackage.objects.get_or_create(
+                course=course,
+                version=version,
+                base_version=base_version,
+                defaults={'course_version': course_version},
+            )
+    except IntegrityError:
+        # another request created it first
+        package = CoursePackage.objects.get(
+            course=course, version=version, base_version=base_version
+        )
+        created = False
+    if created:
+        run_in_background(build_package, package.pk)
+    elif package.status == CoursePackage.FAILED:
+        claimed = CoursePackage.objects.filter(
+            pk=package.pk, status=CoursePackage.FAILED
+        ).update(status=CoursePackage.PENDING, updated=timezone.now())
+        package.status = CoursePackage.PENDING
+        if claimed:
+            run_in_background(build_package, package.pk)
+    elif package.status == CoursePackage.PENDING:
+        _reschedule_if_stale(package)
+    return package, created
+
+
+def _reschedule_if_stale(package):
+    now = timezone.now()
+    if package.updated >= now - BUILD_TIMEOUT:
+        return
+    # Claim the rebuild with a conditional UPDATE: of several requests
+    # seeing the same stale package, only the first one matches.
+    claimed = CoursePackage.objects.filter(
+        pk=package.pk, status=CoursePackage.PENDING, updated__lt=now - BUILD_TIMEOUT
+    ).update(updated=now)
+    if claimed:
+        run_in_background(build_package, package.pk)
+
+
+def _content_entry(content):
+    item = content.item
+    entry = {
+        'id': content.pk,
+        'order': content.order,
+        'type': content.content_type.model,
+        'title': item.title,
+        'path': f'contents/{content.pk}.html',
+        'media': None,
+    }
+    digest = hashlib.sha256(item.render().encode())
+    if entry['type'] in ('file', 'image') and item.file:
+        entry['media'] = f'media/{item.file.name}'
+        digest.update(item.file.name.encode())
+    entry['hash'] = digest.hexdigest()
+    return entry
+
+
+def build_manifest(course):
+    """
+    Describe every module and content of `course`, with a hash per content
+    so that two manifests can be compared without the package files.
+    """
+    modules = list(
+        Module.objects.filter(course=course)
+        .prefetch_related(
+            Prefetch(
+                'contents',
+                queryset=Content.objects.with_items().select_related('content_type'),
+            )
+        )
+    )
+    fragments.prime(
+        [content.item for module in modules for content in module.contents.all()]
+    )
+    return {
+        'course': {'id': course.pk, 'title': course.title, 'slug': course.slug},
+        'modules': [
+            {
+                'id': module.pk,
+                'title': module.title,
+                'description': module.description,
+                'order': module.order,
+                'contents': [
+                    _content_entry(content)
+                    for content in module.contents.all()
+                    if content.item is not None
+                ],
+            }
+            for module in modules
+        ],
+    }
+
+
+def _content_items(modules):
+    return {
+        content.pk: content.item
+        for module in modules
+        for content in module.contents.all()
+        if content.item is not None
+    }
+
+
+def build_package(package_id):
+    """
+    Background job: write the zip of a pending package and mark it ready.
+    """
+    package = (
+        CoursePackage.objects.select_related('course')
+        .filter(pk=package_id, status=CoursePackage.PENDING)
+        .first()
+    )
+    if package is None:
+        return
+    try:
+        _build(package)
+    except Exception:
+        CoursePackage.objects.filter(pk=package.pk).update(
+            status=CoursePackage.FAILED, updated=timezone.now()
+        )
+        raise
+    if not package.base_version:
+        prune(package.course)
+
+
+def _build(package):
+    course = package.course
+    if package.base_version:
+        full = CoursePackage.objects.get(
+            course=course, version=package.version, base_version=0
+        )
+        base = CoursePackage.objects.get(
+            course=course, version=package.base_version, base_version=0
+        )
+        manifest = dict(full.manifest)
+        known = {
+            entry['id']: entry['hash']
+            for module in base.manifest['modules']
+            for entry in module['contents']
+        }
+        current = {
+            entry['id']: entry
+            for module in manifest['modules']
+            for entry in module['contents']
+        }
+        changed = [pk for pk, entry in current.items() if known.get(pk) != entry['hash']]
+        manifest['removed'] = sorted(set(known) - set(current))
+    else:
+        manifest = build_manifest(course)
+        changed = [
+            entry['id'] for module in manifest['modules'] for entry in module['contents']
+        ]
+    manifest['version'] = package.version
+    manifest['base_version'] = package.base_version
+    manifest['changed'] = changed
+
+    items = _changed_items(course, changed)
+    with tempfile.TemporaryFile() as fp:
+        with zipfile.ZipFile(fp, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr(MANIFEST_NAME, json.dumps(manifest))
+            entries = {
+                entry['id']: entry
+                for module in manifest['modules']
+                for entry in module['contents']
+            }
+            written = set()
+            for content_id, item in items.items():
+                entry = entries[content_id]
+                archive.writestr(entry['path'], item.render())
+                if entry['media'] and entry['media'] not in written:
+                    # items sharing a blob share its entry; media is
+                    # already compressed, store it as is
+                    written.add(entry['media'])
+                    with item.file.open('rb') as src, archive.open(
+                        zipfile.ZipInfo(entry['media']), 'w'
+                    ) as dst:
+                        shutil.copyfileobj(src, dst)
+        fp.seek(0)
+        name = f'{course.slug}-v{package.version}'
+        if package.base_version:
+            name += f'-from-v{package.base_version}'
+        package.file.save(f'{name}.zip', DjangoFile(fp), save=False)
+    package.manifest = manifest
+    package.status = CoursePackage.READY
+    package.save()
+
+
+def _changed_items(course, content_ids):
+    modules = list(
+        Module.objects.filter(course=course, contents__pk__in=content_ids)
+        .distinct()
+        .prefetch_related(
+            Prefetch(
+                'contents',
+                queryset=Content.objects.filter(pk__in=content_ids).with_items(),
+            )
+        )
+    )
+    items = _content_items(modules)
+    fragments.prime(items.values())
+    return items
+
+
+def prune(course):
+    """
+    Delete the full packages older than the newest `KEEP_PACKAGES` and the
+    deltas that do not lead to the newest one, together with their files.
+    """
+    versions = list(
+        CoursePackage.objects.filter(
+            course=course, base_version=0, status=CoursePackage.READY
+        ).values_list('version', flat=True)[:KEEP_PACKAGES]
+    )
+    if not versions:
+        return
+    stale = CoursePackage.objects.filter(course=course).filter(
+        Q(version__lt=versions[-1])
+        | Q(base_version__gt=0, version__lt=versions[0])
+        | Q(base_version__gt=0, base_version__lt=versions[-1])
+    )
+    for package in stale:
+        if package.file:
+            package.file.delete(save=False)
+    stale.delete()
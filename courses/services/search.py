@@ -0,0 +1,145 @@
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, TextField, Value, When
+from django.db.models.functions import Concat, Left
+
+from courses.models import Content, Course, Module, Text
+from .catalog import COURSE_ROW_FIELDS, course_row
+
+SEARCH_CONFIG = 'english'
+# Characters of module and text content indexed per course, well below the
+# 1MB limit of a tsvector.
+MAX_DOCUMENT_LENGTH = 200_000
+
+
+def enabled():
+    """
+    Full-text search needs PostgreSQL. Elsewhere (the sqlite local settings)
+    `search_vector` stays empty and searches fall back to icontains.
+    """
+    return connection.vendor == 'postgresql'
+
+
+def _module_text():
+    return Subquery(
+        Module.objects.filter(course=OuterRef('pk'))
+        .order_by()
+        .values('course')
+        .annotate(
+            text=StringAgg(
+                Concat('title', Value(' '), 'description', output_field=TextField()),
+                delimiter=' ',
+            )
+        )
+        .values('text')
+    )
+
+
+def _content_text():
+    return Subquery(
+        Content.objects.filter(
+            module__course=OuterRef('pk'),
+            content_type=ContentType.objects.get_for_model(Text),
+        )
+        .order_by()
+        .values('module__course')
+        .annotate(
+            text=StringAgg(
+                Subquery(Text.objects.filter(pk=OuterRef('object_id')).values('content')),
+                delimiter=' ',
+            )
+        )
+        .values('text')
+    )
+
+
+def document():
+    """
+    The search vector of a course, computed in SQL: title (A), overview (B),
+    module titles and descriptions (C) and the course's Text contents (D).
+    """
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('overview', weight='B', config=SEARCH_CONFIG)
+        + SearchVector(
+            Left(_module_text(), MAX_DOCUMENT_LENGTH), weight='C', config=SEARCH_CONFIG
+        )
+        + SearchVector(
+            Left(_content_text(), MAX_DOCUMENT_LENGTH), weight='D', config=SEARCH_CONFIG
+        )
+    )
+
+
+def update_courses(course_ids=None):
+    """
+    Recompute `Course.search_vector` with one UPDATE, for `course_ids` or for
+    every course.
+    """
+    if not enabled():
+        return 0
+    qs = Course.objects.all()
+    if course_ids is not None:
+        course_ids = {pk for pk in course_ids if pk is not None}
+        if not course_ids:
+            return 0
+        qs = qs.filter(pk__in=course_ids)
+    return qs.update(search_vector=document())
+
+
+def update_texts(text_ids):
+    if not enabled():
+        return
+    update_courses(
+        Content.objects.filter(
+            content_type=ContentType.objects.get_for_model(Text),
+            object_id__in=text_ids,
+        ).values_list('module__course_id', flat=True)
+    )
+
+
+def search_courses(query, subject_id=None):
+    """
+    Courses matching the web-search style `query`, best match first, with
+    their `rank`. The match uses the GIN index on `search_vector`.
+    """
+    if not enabled():
+        return _search_courses_fallback(query, subject_id)
+    search_query = SearchQuery(query, search_type='websearch', config=SEARCH_CONFIG)
+    qs = Course.objects.filter(search_vector=search_query)
+    if subject_id is not None:
+        qs = qs.filter(subject_id=subject_id)
+    return qs.annotate(rank=SearchRank(F('search_vector'), search_query)).order_by(
+        '-rank', '-created', 'id'
+    )
+
+
+def _search_courses_fallback(query, subject_id=None):
+    """
+    `search_courses()` without full-text search: every word of `query` must
+    appear in the title or overview, title matches first.
+    """
+    qs = Course.objects.all()
+    for word in query.split():
+        qs = qs.filter(Q(title__icontains=word) | Q(overview__icontains=word))
+    if subject_id is not None:
+        qs = qs.filter(subject_id=subject_id)
+    return qs.annotate(
+        rank=Case(
+            When(title__icontains=query, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    ).order_by('-rank', '-created', 'id')
+
+
+async def asearch_course_rows(query, subject_id=None, offset=0, limit=10):
+    """
+    One page of search results shaped like `catalog.acourse_rows()`.
+    """
+    qs = search_courses(query, subject_id).annotate(total_modules=F('module_count'))
+    return [
+        course_row(row)
+        async for row in qs.values(*COURSE_ROW_FIELDS)[offset:offset + limit]
+    ]
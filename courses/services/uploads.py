@@ -0,0 +1,175 @@
+import hashlib
+import shutil
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.files import File as DjangoFile
+from django.db import transaction
+from django.utils import timezone
+
+from courses.models import Content, UploadSession
+
+# Clients should send chunks of this size; larger ones are refused.
+CHUNK_SIZE = 5 * 1024 * 1024
+MAX_CHUNK_SIZE = 16 * 1024 * 1024
+MAX_UPLOAD_SIZE = 4 * 1024 * 1024 * 1024
+# Sessions untouched for longer than this are removed.
+SESSION_TIMEOUT = timedelta(days=1)
+_COPY_BUFFER = 64 * 1024
+
+
+class UploadError(Exception):
+    status = 400
+
+    def __init__(self, message, **extra):
+        super().__init__(message)
+        self.extra = extra
+
+
+class OffsetMismatch(UploadError):
+    status = 409
+
+
+class ChunkTooLarge(UploadError):
+    status = 413
+
+
+def part_path(session):
+    return Path(settings.CHUNKED_UPLOAD_DIR) / f'{session.pk}.part'
+
+
+def start(owner, module, model, title, filename, size, sha256='', item=None):
+    """
+    Open an upload session for a new `model` item in `module`, or for
+    replacing the file of `item`.
+    """
+    if size <= 0 or size > MAX_UPLOAD_SIZE:
+        raise UploadError(f'size must be between 1 and {MAX_UPLOAD_SIZE} bytes')
+    session = UploadSession.objects.create(
+        owner=owner,
+        module=module,
+        content_type=ContentType.objects.get_for_model(model),
+        object_id=item.pk if item is not None else None,
+        title=title,
+        filename=Path(filename).name,
+        size=size,
+        sha256=sha256.lower(),
+    )
+    path = part_path(session)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.touch()
+    return session
+
+
+def _check_chunk(session, offset, length):
+    if session.status != UploadSession.OPEN:
+        raise OffsetMismatch('Upload is already complete', offset=session.offset)
+    if offset != session.offset:
+        raise OffsetMismatch('Chunk does not start at the current offset', offset=session.offset)
+    if length <= 0 or offset + length > session.size:
+        raise UploadError('Chunk does not fit the declared size', offset=session.offset)
+
+
+def append(session_id, owner, offset, stream, length, chunk_sha256=''):
+    """
+    Write `length` bytes read from `stream` at `offset`. The chunk is read
+    from the client into a scratch file first; only copying it into the
+    part and moving the offset happen with the session row locked, so
+    concurrent retries of the same chunk cannot interleave and a slow client
+    holds no lock. A chunk that does not start at the current offset raises
+    OffsetMismatch carrying that offset. The last chunk completes the upload.
+    """
+    if length > MAX_CHUNK_SIZE:
+        raise ChunkTooLarge(f'Chunks are limited to {MAX_CHUNK_SIZE} bytes')
+    session = UploadSession.objects.get(pk=session_id, owner=owner)
+    # refuse early what the locked check below would refuse anyway
+    _check_chunk(session, offset, length)
+
+    with tempfile.TemporaryFile(dir=part_path(session).parent) as chunk:
+        digest = hashlib.sha256()
+        written = 0
+        while written < length:
+            data = stream.read(min(_COPY_BUFFER, length - written))
+            if not data:
+                break
+            chunk.write(data)
+            digest.update(data)
+            written += len(data)
+        if written != length or (chunk_sha256 and digest.hexdigest() != chunk_sha256.lower()):
+            # nothing was written to the part, the client resends the chunk
+            raise UploadError('Chunk was incomplete or corrupt', offset=session.offset)
+
+        with transaction.atomic():
+            session = (
+                UploadSession.objects.select_for_update()
+                .select_related('content_type')
+                .get(pk=session_id, owner=owner)
+            )
+            _check_chunk(session, offset, length)
+            chunk.seek(0)
+            with open(part_path(session), 'r+b') as fp:
+                fp.seek(offset)
+                shutil.copyfileobj(chunk, fp, _COPY_BUFFER)
+            session.offset = offset + length
+            if session.offset < session.size:
+                session.save(update_fields=['offset', 'updated'])
+                return session
+            verified = _complete(session)
+    if not verified:
+        raise UploadError('File checksum does not match', offset=0)
+    return session
+
+
+def _complete(session):
+    path = part_path(session)
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fp:
+        for block in iter(lambda: fp.read(_COPY_BUFFER), b''):
+            digest.update(block)
+    if session.sha256 and digest.hexdigest() != session.sha256:
+        # nothing of the assembled file can be trusted, start over
+        with open(path, 'r+b') as fp:
+            fp.truncate(0)
+        session.offset = 0
+        session.save(update_fields=['offset', 'updated'])
+        return False
+
+    model = session.content_type.model_class()
+    if session.object_id is not None:
+        item = model.objects.get(pk=session.object_id, owner=session.owner)
+    else:
+        item = model(owner=session.owner)
+    item.title = session.title
+    with open(path, 'rb') as fp:
+        item.file.save(session.filename, DjangoFile(fp), save=False)
+    # the replaced blob is released by the signals
+    item.save()
+    if session.object_id is None:
+        Content.objects.create(module=session.module, item=item)
+
+    session.object_id = item.pk
+    session.sha256 = digest.hexdigest()
+    session.status = UploadSession.COMPLETE
+    session.save(update_fields=['object_id', 'sha256', 'offset', 'status', 'updated'])
+    path.unlink(missing_ok=True)
+    return True
+
+
+def discard(session):
+    part_path(session).unlink(missing_ok=True)
+    session.delete()
+
+
+def clear_stale(timeout=SESSION_TIMEOUT):
+    """
+    Remove sessions not written to within `timeout`, and their parts.
+    """
+    stale = UploadSession.objects.filter(updated__lt=timezone.now() - timeout)
+    count = 0
+    for session in stale:
+        discard(session)
+        count += 1
+    return count
@@ -0,0 +1,53 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _version_key(scope, pk):
+    return f'version:{scope}:{pk}'
+
+
+def _initial_version():
+    # Seed from the clock so that a version key evicted from the cache never
+    # comes back with a number that was already used for stale entries.
+    return time.time_ns() // 1000
+
+
+def get_version(scope, pk):
+    key = _version_key(scope, pk)
+    version = cache.get(key)
+    if version is None:
+        version = _initial_version()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+async def aget_version(scope, pk):
+    key = _version_key(scope, pk)
+    version = await cache.aget(key)
+    if version is None:
+        version = _initial_version()
+        if not await cache.aadd(key, version, None):
+            version = await cache.aget(key, version)
+    return version
+
+
+def bump_version(scope, pk):
+    key = _version_key(scope, pk)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = _initial_version()
+        cache.set(key, version, None)
+        return version
+
+
+def bump_version_on_commit(scope, pk):
+    """
+    Bump the version once the current transaction commits (right away
+    outside of one). Bumping earlier lets a reader re-cache the old rows
+    under the new version before they change.
+    """
+    transaction.on_commit(lambda: bump_version(scope, pk))
@@ -0,0 +1,201 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from lenextra import derivatives
+from lenextra.background import run_in_background
+
+from .models import Content, Course, File, Image, Module, Subject, Text, Video
+from .services import blobs, catalog, counters, enrollment, fragments, search
+from .services.versions import bump_version_on_commit
+
+
+@receiver(pre_save, sender=Course)
+def remember_course_subject(sender, instance: Course, **kwargs):
+    # A course moved to another subject must also leave the old listing.
+    instance._previous_subject_id = None
+    if instance.pk:
+        instance._previous_subject_id = (
+            Course.objects.filter(pk=instance.pk)
+            .values_list('subject_id', flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Course)
+def count_subject_courses(sender, instance: Course, created, **kwargs):
+    previous = getattr(instance, '_previous_subject_id', None)
+    if created:
+        counters.add_courses(instance.subject_id, 1)
+    elif previous and previous != instance.subject_id:
+        counters.add_courses(previous, -1)
+        counters.add_courses(instance.subject_id, 1)
+
+
+@receiver(post_delete, sender=Course)
+def uncount_subject_course(sender, instance: Course, **kwargs):
+    counters.add_courses(instance.subject_id, -1)
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def invalidate_course_catalog(sender, instance: Course, **kwargs):
+    previous = getattr(instance, '_previous_subject_id', None)
+    if previous and previous != instance.subject_id:
+        catalog.invalidate_subject(previous)
+    catalog.invalidate_subject(instance.subject_id)
+    catalog.invalidate_course(instance.pk)
+
+
+@receiver(post_save, sender=Module)
+def count_course_module(sender, instance: Module, created, **kwargs):
+    if created:
+        counters.add_modules(instance.course_id, 1)
+
+
+@receiver(post_delete, sender=Module)
+def uncount_course_module(sender, instance: Module, **kwargs):
+    counters.add_modules(instance.course_id, -1)
+
+
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+def invalidate_module_catalog(sender, instance: Module, **kwargs):
+    subject_id = (
+        Course.objects.filter(pk=instance.course_id)
+        .values_list('subject_id', flat=True)
+        .first()
+    )
+    catalog.invalidate_subject(subject_id)
+    bump_version_on_commit('module', instance.pk)
+    catalog.invalidate_course(instance.course_id)
+
+
+@receiver(post_save, sender=Course)
+def index_course(sender, instance: Course, **kwargs):
+    search.update_courses([instance.pk])
+
+
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+def index_module_course(sender, instance: Module, **kwargs):
+    search.update_courses([instance.course_id])
+
+
+@receiver(post_save, sender=Content)
+@receiver(post_delete, sender=Content)
+def index_content_course(sender, instance: Content, **kwargs):
+    if search.enabled() and instance.content_type_id == ContentType.objects.get_for_model(Text).pk:
+        search.update_courses(
+            Module.objects.filter(pk=instance.module_id).values_list('course_id', flat=True)
+        )
+
+
+@receiver(post_save, sender=Text)
+def index_text_courses(sender, instance: Text, **kwargs):
+    search.update_texts([instance.pk])
+
+
+@receiver(post_save, sender=Subject)
+@receiver(post_delete, sender=Subject)
+def invalidate_subject_catalog(sender, instance: Subject, **kwargs):
+    catalog.invalidate_subject(instance.pk)
+
+
+@receiver(post_save, sender=Content)
+@receiver(post_delete, sender=Content)
+def invalidate_content_module(sender, instance: Content, **kwargs):
+    catalog.invalidate_modules([instance.module_id])
+
+
+@receiver(post_save, sender=Text)
+@receiver(post_save, sender=Video)
+@receiver(post_save, sender=Image)
+@receiver(post_save, sender=File)
+def store_item_fragment(sender, instance, **kwargs):
+    fragments.store(instance)
+    module_ids = Content.objects.filter(
+        content_type=ContentType.objects.get_for_model(instance),
+        object_id=instance.pk,
+    ).values_list('module_id', flat=True)
+    catalog.invalidate_modules(module_ids)
+
+
+@receiver(pre_save, sender=Image)
+@receiver(pre_save, sender=File)
+def remember_item_file(sender, instance, **kwargs):
+    instance._previous_file = None
+    if instance.pk:
+        instance._previous_file = (
+            sender.objects.filter(pk=instance.pk)
+            .values_list('file', flat=True)
+            .first()
+        )
+
+
+@receiver(pre_save, sender=Image)
+def reset_image_derivatives(sender, instance: Image, **kwargs):
+    if instance.pk and instance.file.name != getattr(instance, '_previous_file', None):
+        # the variants describe the previous picture until the job rebuilds them;
+        # they belong to its blob and go when the blob is collected
+        instance.derivatives = {}
+
+
+@receiver(post_save, sender=Image)
+@receiver(post_save, sender=File)
+def count_item_blob(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_file', None)
+    if instance.file.name != previous:
+        blobs.acquire(instance.file.name)
+        blobs.release(previous)
+
+
+@receiver(post_save, sender=Image)
+def schedule_image_derivatives(sender, instance: Image, **kwargs):
+    if instance.file and instance.file.name != getattr(instance, '_previous_file', None):
+        run_in_background(
+            derivatives.build, Image, instance.pk, 'file', 'derivatives', ['updated']
+        )
+
+
+@receiver(post_delete, sender=Image)
+@receiver(post_delete, sender=File)
+def release_item_blob(sender, instance, **kwargs):
+    blobs.release(instance.file.name)
+
+
+@receiver(m2m_changed, sender=Course.students.through)
+def invalidate_enrollments(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # user.courses_joined was changed
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            enrollment.invalidate([instance.pk])
+        return
+    if action == 'pre_clear':
+        instance._cleared_student_ids = list(
+            instance.students.values_list('pk', flat=True)
+        )
+    elif action in ('post_add', 'post_remove'):
+        enrollment.invalidate(pk_set)
+    elif action == 'post_clear':
+        enrollment.invalidate(getattr(instance, '_cleared_student_ids', []))
+
+
+@receiver(m2m_changed, sender=Course.students.through)
+def count_course_students(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        instance._cleared_course_ids = list(
+            instance.courses_joined.values_list('pk', flat=True)
+        )
+        return
+    course_ids = pk_set if reverse else [instance.pk]
+    if action == 'post_add' and pk_set:
+        # pk_set only holds the rows that were actually inserted
+        counters.add_students(course_ids, len(pk_set) if not reverse else 1)
+    elif action == 'post_remove' and pk_set:
+        # pk_set holds the requested ids, which may not all have existed
+        counters.recount_courses(course_ids)
+    elif action == 'post_clear':
+        if reverse:
+            course_ids = getattr(instance, '_cleared_course_ids', [])
+        counters.recount_courses(course_ids)
@@ -0,0 +1,59 @@
+import hashlib
+import posixpath
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils.deconstruct import deconstructible
+
+# Directory of content-addressed blobs, relative to MEDIA_ROOT.
+BLOB_DIR = 'blobs'
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Store each upload under the sha256 of its bytes, so identical uploads
+    share one file. Reference counts of the blobs are kept by
+    `courses.services.blobs`; nothing else may delete them.
+    """
+
+    def blob_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        sha = digest.hexdigest()
+        ext = posixpath.splitext(name)[1].lower()
+        return posixpath.join(BLOB_DIR, sha[:2], sha[2:4], sha + ext)
+
+    def get_available_name(self, name, max_length=None):
+        if self.is_blob(name):
+            return super().get_available_name(name, max_length)
+        # the upload name is replaced by the blob name in _save()
+        return name
+
+    def _save(self, name, content):
+        from courses.models import MediaBlob
+
+        name = self.blob_name(name, content)
+        # Lock the blob row against blobs.collect(), which deletes the file
+        # under the same lock: either collect finished first and the file
+        # is written again below, or it waits until the caller's transaction
+        # has counted the new reference. Save items inside a transaction so
+        # the lock lasts until then.
+        with transaction.atomic():
+            list(MediaBlob.objects.select_for_update().filter(name=name).values_list('pk'))
+            if self.exists(name):
+                return name
+            saved = super()._save(name, content)
+        if saved != name:
+            # a concurrent upload of the same bytes won the race
+            super().delete(saved)
+        return name
+
+    def is_blob(self, name):
+        return name.startswith(BLOB_DIR + '/')
+
+
+blob_storage = ContentAddressedStorage()
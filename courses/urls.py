@@ -12,6 +12,9 @@ urlpatterns =  [
     path('<pk>/edit/', 
          views.CourseUpdateView.as_view(), 
          name='course_edit'),
+    path('<pk>/clone/',
+         views.CourseCloneView.as_view(),
+         name='course_clone'),
     path('<pk>/delete/', 
          views.CourseDeleteView.as_view(), 
          name='course_delete'),
@@ -48,6 +51,16 @@ urlpatterns =  [
         views.ContentOrderView.as_view(),
         name='content_order',
     ),
+    path(
+        'upload/',
+        views.UploadSessionCreateView.as_view(),
+        name='upload_create',
+    ),
+    path(
+        'upload/<uuid:session_id>/',
+        views.UploadSessionView.as_view(),
+        name='upload_session',
+    ),
     path('subject/<slug:subject>/', 
          views.CourseListView.as_view(), 
          name='course_list_subject'),
@@ -1,20 +1,21 @@
-from braces.views import CsrfExemptMixin, JsonRequestResponseMixin
+from braces.views import CsrfExemptMixin, JSONResponseMixin, JsonRequestResponseMixin
 from django.apps import apps
+from django.db import transaction
 from django.forms.models import modelform_factory
+from django.http import Http404
 from django.shortcuts import render, get_object_or_404, redirect
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.views.generic.base import TemplateResponseMixin, View
-from django.views.generic.detail import DetailView
 from django.views.generic.edit import CreateView, DeleteView, UpdateView
-from django.core.cache import cache
 from django.contrib.auth.mixins import (LoginRequiredMixin, PermissionRequiredMixin)
-from django.db.models import Count
 
 from django.views.generic.list import ListView
 from students.forms import CourseEnrollForm
 from .forms import ModuleFormSet, AppointmentFormSet
 
-from .models import Content, Course, Module,Subject, InstructorProfile
+from .models import Content, Course, Module,Subject, InstructorProfile, UploadSession
+from .services import catalog, cloning, search, uploads
+from .services.versions import bump_version, get_version
 
 
 
@@ -62,6 +63,42 @@ class CourseCreateView(OwnerCourseEditMixin, CreateView):
 class CourseUpdateView(OwnerCourseEditMixin, UpdateView):
     permission_required = 'courses.change_course'
 
+class CourseCloneView(OwnerCourseEditMixin, CreateView):
+    """
+    Copy one of the user's courses, with all modules and contents, as a new
+    course; the form starts from the source's fields.
+    """
+    permission_required = 'courses.add_course'
+    source = None
+
+    def get_source(self):
+        if self.source is None:
+            self.source = get_object_or_404(
+                Course, pk=self.kwargs['pk'], owner=self.request.user
+            )
+        return self.source
+
+    def get_initial(self):
+        source = self.get_source()
+        return {
+            'subject': source.subject_id,
+            'title': f'{source.title} (copy)',
+            'overview': source.overview,
+        }
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['source'] = self.get_source()
+        return context
+
+    def form_valid(self, form):
+        self.object = cloning.clone_course(
+            self.get_source(),
+            self.request.user,
+            **{field: form.cleaned_data[field] for field in self.fields},
+        )
+        return redirect(self.get_success_url())
+
 class CourseDeleteView(OwnerCourseMixin, DeleteView):
     template_name = 'courses/manage/course/delete.html'
     permission_required = 'courses.delete_course'
@@ -126,11 +163,19 @@ class ContentCreateUpdateView(TemplateResponseMixin, View):
             )
         return super().dispatch(request, module_id, model_name, id)
 
+    def get_context_data(self, form):
+        return {
+            'form': form,
+            'object': self.obj,
+            'module': self.module,
+            'model_name': self.model._meta.model_name,
+            'chunked_upload': self.model._meta.model_name in ('file', 'image'),
+            'chunk_size': uploads.CHUNK_SIZE,
+        }
+
     def get(self, request, module_id, model_name, id=None):
         form = self.get_form(self.model, instance=self.obj)
-        return self.render_to_response(
-            {'form': form, 'object': self.obj}
-        )
+        return self.render_to_response(self.get_context_data(form))
 
     def post(self, request, module_id, model_name, id=None):
         form = self.get_form(
@@ -140,16 +185,117 @@ class ContentCreateUpdateView(TemplateResponseMixin, View):
             files=request.FILES,
         )
         if form.is_valid():
-            obj = form.save(commit=False)
-            obj.owner = request.user
-            obj.save()
-            if not id:
-                # new content
-                Content.objects.create(module=self.module, item=obj)
+            # one transaction, so the blob stays locked until it is counted
+            with transaction.atomic():
+                obj = form.save(commit=False)
+                obj.owner = request.user
+                obj.save()
+                if not id:
+                    # new content
+                    Content.objects.create(module=self.module, item=obj)
             return redirect('module_content_list', self.module.id)
-        return self.render_to_response(
-            {'form': form, 'object': self.obj}
+        return self.render_to_response(self.get_context_data(form))
+
+
+class UploadSessionCreateView(LoginRequiredMixin, JsonRequestResponseMixin, View):
+    """
+    Open a resumable upload for a File or Image item:
+    {"module": id, "model_name": "file"|"image", "title": str,
+    "filename": str, "size": bytes, "sha256": hex (optional),
+    "item": id (optional, to replace that item's file)}.
+    """
+
+    def post(self, request):
+        payload = self.request_json
+        if not isinstance(payload, dict) or payload.get('model_name') not in ('file', 'image'):
+            return self.render_bad_request_response()
+        model = apps.get_model(app_label='courses', model_name=payload['model_name'])
+        try:
+            module_id = int(payload['module'])
+            size = int(payload['size'])
+            item_id = payload.get('item')
+            item_id = None if item_id is None else int(item_id)
+            title = str(payload['title'])[:250]
+            filename = str(payload['filename'])
+        except (KeyError, TypeError, ValueError):
+            return self.render_bad_request_response()
+        module = get_object_or_404(Module, id=module_id, course__owner=request.user)
+        item = None
+        if item_id is not None:
+            item = get_object_or_404(model, id=item_id, owner=request.user)
+        try:
+            session = uploads.start(
+                request.user, module, model, title, filename, size,
+                sha256=str(payload.get('sha256') or ''), item=item,
+            )
+        except uploads.UploadError as e:
+            return self.render_bad_request_response({'errors': [str(e)]})
+        return self.render_json_response(
+            {
+                'id': str(session.pk),
+                'offset': 0,
+                'chunk_size': uploads.CHUNK_SIZE,
+                'url': reverse('upload_session', args=[session.pk]),
+            },
+            status=201,
+        )
+
+
+class UploadSessionView(LoginRequiredMixin, JSONResponseMixin, View):
+    """
+    GET reports how much of the upload has arrived, so a client can resume.
+    PUT appends the raw request body at the `Upload-Offset` header, with an
+    optional `Upload-Checksum` header holding the chunk's hex sha256.
+    DELETE abandons the upload. The body is streamed to disk, never parsed.
+    """
+
+    def get_session(self, session_id):
+        return get_object_or_404(UploadSession, pk=session_id, owner=self.request.user)
+
+    def session_response(self, session, status=200):
+        return self.render_json_response(
+            {
+                'id': str(session.pk),
+                'offset': session.offset,
+                'size': session.size,
+                'status': session.status,
+                'item': session.object_id if session.status == UploadSession.COMPLETE else None,
+            },
+            status=status,
         )
+
+    def get(self, request, session_id):
+        return self.session_response(self.get_session(session_id))
+
+    def put(self, request, session_id):
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.headers['Content-Length'])
+        except (KeyError, ValueError):
+            return self.render_json_response(
+                {'errors': ['Upload-Offset and Content-Length are required']}, status=400
+            )
+        self.get_session(session_id)
+        try:
+            session = uploads.append(
+                session_id,
+                request.user,
+                offset,
+                request,
+                length,
+                chunk_sha256=request.headers.get('Upload-Checksum', ''),
+            )
+        except uploads.UploadError as e:
+            return self.render_json_response(
+                {'errors': [str(e)], **e.extra}, status=e.status
+            )
+        return self.session_response(session)
+
+    def delete(self, request, session_id):
+        session = self.get_session(session_id)
+        if session.status == UploadSession.OPEN:
+            uploads.discard(session)
+        return self.render_json_response({'deleted': True})
         
 class ContentDeleteView(View):
     def post(self, request, id):
@@ -157,8 +303,10 @@ class ContentDeleteView(View):
             Content, id=id, module__course__owner=request.user
         )
         module = content.module
-        content.item.delete()
-        content.delete()
+        with transaction.atomic():
+            # the item's media blob is deleted on commit if now unused
+            content.item.delete()
+            content.delete()
         return redirect('module_content_list', module.id)
     
 class ModuleContentListView(TemplateResponseMixin, View):
@@ -166,27 +314,131 @@ class ModuleContentListView(TemplateResponseMixin, View):
 
     def get(self, request, module_id):
         module = get_object_or_404(
-            Module, id=module_id, course__owner=request.user
+            Module.objects.select_related('course'),
+            id=module_id,
+            course__owner=request.user,
+        )
+        module_number = Module.objects.filter(
+            course_id=module.course_id, order__lt=module.order
+        ).count() + 1
+        return self.render_to_response(
+            {
+                'module': module,
+                'module_number': module_number,
+                'contents': module.contents.with_items(),
+                'module_order_version': get_version('module_order', module.course_id),
+                'content_order_version': get_version('content_order', module.id),
+            }
         )
-        return self.render_to_response({'module': module})
     
     
-class ModuleOrderView(CsrfExemptMixin, JsonRequestResponseMixin, View):
-    def post(self, request):
-        for id, order in self.request_json.items():
-            Module.objects.filter(
-                id=id, course__owner=request.user
-            ).update(order=order)
-        return self.render_json_response({'saved': 'OK'})
-
+class BulkOrderMixin(CsrfExemptMixin, JsonRequestResponseMixin):
+    """
+    Save a drag-and-drop ordering in a single UPDATE.
+
+    Accepts either a plain {id: order} mapping, {"order": {id: order},
+    "version": n}, or a single move {"move": id, "after": id|null,
+    "version": n} that rewrites only the moved row. When a version is sent
+    and another edit has been saved since, nothing is written and 409 is
+    returned with the current version.
+
+    Subclasses set the attributes below and define invalidate(parent_id).
+    """
+    model = None
+    parent_field = None
+    owner_lookup = None
+    version_scope = None
 
-class ContentOrderView(CsrfExemptMixin, JsonRequestResponseMixin, View):
     def post(self, request):
-        for id, order in self.request_json.items():
-            Content.objects.filter(
-                id=id, module__course__owner=request.user
-            ).update(order=order)
-        return self.render_json_response({'saved': 'OK'})    
+        payload = self.request_json
+        if not isinstance(payload, dict):
+            return self.render_bad_request_response()
+        client_version = payload.get('version')
+        move = None
+        if 'move' in payload:
+            try:
+                move = int(payload['move'])
+                after = payload.get('after')
+                after = None if after is None else int(after)
+            except (TypeError, ValueError):
+                return self.render_bad_request_response()
+            if move == after:
+                return self.render_bad_request_response()
+            ids = {move} if after is None else {move, after}
+        else:
+            if 'order' in payload:
+                payload = payload['order']
+            else:
+                client_version = None
+            try:
+                new_order = {int(pk): int(order) for pk, order in payload.items()}
+            except (AttributeError, TypeError, ValueError):
+                return self.render_bad_request_response()
+            if not new_order or min(new_order.values()) < 0:
+                return self.render_bad_request_response()
+            ids = set(new_order)
+
+        parent_attname = self.model._meta.get_field(self.parent_field).attname
+        owned = dict(
+            self.model.objects.filter(
+                id__in=ids, **{self.owner_lookup: request.user}
+            ).values_list('id', parent_attname)
+        )
+        if len(owned) != len(ids):
+            return self.render_json_response(
+                {'errors': ['Unknown or foreign items in ordering']}, status=403
+            )
+        parents = set(owned.values())
+        if len(parents) != 1:
+            return self.render_bad_request_response(
+                {'errors': [f'All items must belong to the same {self.parent_field}']}
+            )
+        parent_id = parents.pop()
+
+        parent_model = self.model._meta.get_field(self.parent_field).related_model
+        with transaction.atomic():
+            # Lock the parent row so the version check, the write and the
+            # bump happen as one step: a concurrent reorder of the same
+            # parent waits here and then sees the bumped version.
+            list(parent_model.objects.select_for_update().filter(pk=parent_id).values_list('pk'))
+            current = get_version(self.version_scope, parent_id)
+            if client_version is not None and client_version != current:
+                return self.render_json_response(
+                    {'errors': ['Ordering was changed by another edit'], 'version': current},
+                    status=409,
+                )
+            if move is not None:
+                objs = self.model.objects.in_bulk(ids)
+                order_field = self.model._meta.get_field('order')
+                order_field.move(objs[move], after=objs.get(after))
+            else:
+                self.model.objects.bulk_update(
+                    [self.model(id=pk, order=order) for pk, order in new_order.items()],
+                    ['order'],
+                )
+            version = bump_version(self.version_scope, parent_id)
+        self.invalidate(parent_id)
+        return self.render_json_response({'saved': 'OK', 'version': version})
+
+
+class ModuleOrderView(BulkOrderMixin, View):
+    model = Module
+    parent_field = 'course'
+    owner_lookup = 'course__owner'
+    version_scope = 'module_order'
+
+    def invalidate(self, parent_id):
+        catalog.invalidate_course(parent_id)
+
+
+class ContentOrderView(BulkOrderMixin, View):
+    model = Content
+    parent_field = 'module'
+    owner_lookup = 'module__course__owner'
+    version_scope = 'content_order'
+
+    def invalidate(self, parent_id):
+        catalog.invalidate_modules([parent_id])
     
     
     
@@ -209,48 +461,72 @@ def manage_appointments(request, instructor_id):
 class CourseListView(TemplateResponseMixin, View):
     model = Course
     template_name = 'courses/course/list.html'
+    replica_reads = True
+    search_page_size = 20
 
-    def get(self, request, subject=None):
-        subjects = cache.get('all_subjects')
-        if not subjects:
-            subjects = Subject.objects.annotate(
-                total_courses=Count('courses')
-            )
-            cache.set('all_subjects', subjects)
-        all_courses = Course.objects.annotate(
-            total_modules=Count('modules')
-        )
+    async def get(self, request, subject=None):
+        subjects = await catalog.asubject_rows()
         if subject:
-            subject = get_object_or_404(Subject, slug=subject)
-            key = f'subject_{subject.id}_courses'
-            courses = cache.get(key)
-            if not courses:
-                courses = all_courses.filter(subject=subject)
-                cache.set(key, courses)
+            subject = next((s for s in subjects if s['slug'] == subject), None)
+            if subject is None:
+                raise Http404('No subject matches the given query.')
+        query = request.GET.get('q', '').strip()
+        page = None
+        if query:
+            try:
+                page = max(int(request.GET.get('page', 1)), 1)
+            except ValueError:
+                page = 1
+            # one extra row tells whether there is a next page, without a COUNT
+            courses = await search.asearch_course_rows(
+                query,
+                subject['id'] if subject else None,
+                offset=(page - 1) * self.search_page_size,
+                limit=self.search_page_size + 1,
+            )
+            has_next = len(courses) > self.search_page_size
+            courses = courses[:self.search_page_size]
+        elif subject:
+            courses = await catalog.acourse_rows(subject['id'])
         else:
-            courses = cache.get('all_courses')
-            if not courses:
-                courses = all_courses
-                cache.set('all_courses', courses)
-        return self.render_to_response(
-            {
-                'subjects': subjects,
-                'subject': subject,
-                'courses': courses,
-            }
-        )
+            courses = await catalog.acourse_rows()
+        context = {
+            'subjects': subjects,
+            'subject': subject,
+            'courses': courses,
+            'query': query,
+        }
+        if page is not None:
+            context.update(
+                {
+                    'page': page,
+                    'previous_page': page - 1 if page > 1 else None,
+                    'next_page': page + 1 if has_next else None,
+                }
+            )
+        return self.render_to_response(context)
         
         
-class CourseDetailView(DetailView):
+class CourseDetailView(TemplateResponseMixin, View):
     model = Course
     template_name = 'courses/course/detail.html'
-    
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['enroll_form'] = CourseEnrollForm(
-            initial={'course': self.object}
+    replica_reads = True
+
+    async def get(self, request, slug):
+        course = await (
+            Course.objects.select_related('subject', 'owner')
+            .filter(slug=slug)
+            .afirst()
+        )
+        if course is None:
+            raise Http404('No course matches the given query.')
+        return self.render_to_response(
+            {
+                'object': course,
+                'course': course,
+                'enroll_form': CourseEnrollForm(initial={'course': course}),
+            }
         )
-        return context
     
     
 
@@ -17,7 +17,10 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'educa.settings')
 
 django_asgi_app = get_asgi_application()
 
-from chat.routing import websocket_urlpatterns
+from chat.routing import websocket_urlpatterns as chat_urlpatterns
+from competitions.routing import websocket_urlpatterns as competition_urlpatterns
+
+websocket_urlpatterns = chat_urlpatterns + competition_urlpatterns
 
 application = ProtocolTypeRouter(
     {
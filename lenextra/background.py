@@ -0,0 +1,33 @@
+"""
+In-process background jobs.
+
+Jobs run on a small thread pool once the surrounding transaction commits, so
+they always see the rows that scheduled them. Nothing is persisted: a job is
+lost if the process exits, so callers must record enough state in the
+database to schedule it again.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='background')
+
+
+def _run(func, args, kwargs):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('Background job %s failed', func.__qualname__)
+    finally:
+        # worker threads outlive requests, do not leak their connections
+        connections.close_all()
+
+
+def run_in_background(func, *args, **kwargs):
+    """
+    Call `func(*args, **kwargs)` on the background pool after commit.
+    """
+    transaction.on_commit(lambda: _executor.submit(_run, func, args, kwargs))
@@ -0,0 +1,134 @@
+"""
+Read replica routing.
+
+Reads go to the `replica` database only inside views that opt in with
+`replica_reads` (or `replica_actions` on a DRF viewset), for safe methods,
+and only while the session has not written recently. Everything else, and
+every read after a write in the same request, uses `default`.
+
+Data copied into shared caches must not come from a lagging replica, so the
+code filling those caches wraps its queries in `use_primary()`.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.utils.deprecation import MiddlewareMixin
+
+PRIMARY = 'default'
+REPLICA = 'replica'
+# A session that wrote reads from the primary for this many seconds, longer
+# than the replication lag we expect.
+PIN_SECONDS = 5
+PIN_COOKIE = 'primary_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class _State:
+    __slots__ = ('replica', 'wrote', 'forced')
+
+    def __init__(self, replica=False):
+        self.replica = replica
+        self.wrote = False
+        self.forced = 0
+
+
+_state = contextvars.ContextVar('replica_state', default=None)
+
+
+def replica_reads(view):
+    """
+    Mark a function or class-based view whose reads may use the replica.
+    """
+    view.replica_reads = True
+    return view
+
+
+@contextmanager
+def use_primary():
+    """
+    Send the reads made inside the block to the primary.
+    """
+    state = _state.get()
+    if state is None:
+        yield
+        return
+    state.forced += 1
+    try:
+        yield
+    finally:
+        state.forced -= 1
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.replica or state.wrote or state.forced:
+            return PRIMARY
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
+
+
+def _pinned(request):
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def _view_allows_replica(request, view_func):
+    if getattr(view_func, 'replica_reads', False):
+        return True
+    view_class = getattr(view_func, 'view_class', None) or getattr(view_func, 'cls', None)
+    if getattr(view_class, 'replica_reads', False):
+        return True
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(request.method.lower())
+    return action in getattr(view_class, 'replica_actions', ())
+
+
+class ReplicaRoutingMiddleware(MiddlewareMixin):
+    """
+    Decide per request whether reads may use the replica, and pin a session
+    to the primary for `PIN_SECONDS` after it writes.
+    """
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        replica = (
+            replica_configured()
+            and request.method in SAFE_METHODS
+            and not _pinned(request)
+            and _view_allows_replica(request, view_func)
+        )
+        request._replica_state = _State(replica)
+        _state.set(request._replica_state)
+
+    def process_response(self, request, response):
+        state = getattr(request, '_replica_state', None)
+        if state is not None and (state.wrote or request.method not in SAFE_METHODS):
+            response.set_cookie(
+                PIN_COOKIE,
+                str(time.time() + PIN_SECONDS),
+                max_age=PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        _state.set(None)
+        return response
@@ -0,0 +1,134 @@
+"""
+Resized, recompressed variants of uploaded images.
+
+Variants are written to the default storage under `derivatives/`, named after
+the original file, so an original shared by several rows (see
+courses.storage) is only resized once. The widths and names actually written
+are kept in a JSONField next to the file and turned into `srcset` values for
+the templates.
+"""
+import logging
+import posixpath
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_DIR = 'derivatives'
+WIDTHS = (320, 640, 1024, 1600)
+# srcset type -> (Pillow format, save options), preferred first
+FORMATS = {
+    'webp': ('WEBP', {'quality': 78, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 80, 'optimize': True, 'progressive': True}),
+}
+
+
+def derivative_name(name, width, fmt):
+    stem = posixpath.splitext(name)[0]
+    return posixpath.join(DERIVATIVE_DIR, stem, f'{width}.{fmt}')
+
+
+def _encode(image, fmt):
+    pil_format, options = FORMATS[fmt]
+    if pil_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    buffer = BytesIO()
+    image.save(buffer, pil_format, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def generate(storage, name):
+    """
+    Write the variants of image `name` read from `storage` that are missing
+    and describe them. Returns {} for files that are not still images, or
+    that are too small to need variants.
+    """
+    try:
+        with storage.open(name, 'rb') as fp:
+            image = Image.open(fp)
+            if getattr(image, 'is_animated', False):
+                return {}
+            width, height = image.size
+            transposed = image.getexif().get(0x0112, 1) in (5, 6, 7, 8)
+            if transposed:
+                width, height = height, width
+            widths = [w for w in WIDTHS if w < width]
+            if not widths:
+                return {}
+            names = {
+                (w, fmt): derivative_name(name, w, fmt) for w in widths for fmt in FORMATS
+            }
+            missing = [key for key, path in names.items() if not default_storage.exists(path)]
+            if missing:
+                image = ImageOps.exif_transpose(image)
+                image.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        logger.warning('Cannot make derivatives of %s', name)
+        return {}
+
+    resized = {}
+    for w, fmt in missing:
+        if w not in resized:
+            resized[w] = image.resize(
+                (w, round(height * w / width)), Image.Resampling.LANCZOS
+            )
+        names[w, fmt] = default_storage.save(names[w, fmt], _encode(resized[w], fmt))
+    return {
+        'width': width,
+        'height': height,
+        'variants': {
+            fmt: [[w, names[w, fmt]] for w in widths] for fmt in FORMATS
+        },
+    }
+
+
+def srcsets(derivatives, original_url=None):
+    """
+    Map each srcset type of `derivatives` to a `srcset` attribute value. The
+    original, if given, is offered as the widest candidate.
+    """
+    result = {}
+    for fmt, variants in (derivatives or {}).get('variants', {}).items():
+        candidates = [f'{default_storage.url(path)} {w}w' for w, path in variants]
+        if original_url and fmt == 'jpeg':
+            candidates.append(f"{original_url} {derivatives['width']}w")
+        result[fmt] = ', '.join(candidates)
+    return result
+
+
+def delete(name):
+    """
+    Delete every variant of `name`.
+    """
+    directory = posixpath.join(DERIVATIVE_DIR, posixpath.splitext(name)[0])
+    try:
+        _, files = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for filename in files:
+        default_storage.delete(posixpath.join(directory, filename))
+
+
+def build(model, pk, field, target, update_fields=()):
+    """
+    Background job: generate the variants of `model` row `pk`'s file
+    `field` and store their description in its JSONField `target`.
+    """
+    obj = model.objects.filter(pk=pk).first()
+    if obj is None or not getattr(obj, field):
+        return
+    name = getattr(obj, field).name
+    result = generate(getattr(obj, field).storage, name)
+    with transaction.atomic():
+        obj = model.objects.select_for_update().filter(pk=pk).first()
+        if obj is None or getattr(obj, field).name != name:
+            # replaced while resizing, the new file has its own job
+            return
+        setattr(obj, target, result)
+        obj.save(update_fields=[target, *update_fields])
@@ -49,6 +49,7 @@ INSTALLED_APPS = [
     'debug_toolbar',
     'redisboard',
     'rest_framework',
+    'rest_framework.authtoken',
     'payments',
 
     # Local apps (deps first)
@@ -72,6 +73,8 @@ MIDDLEWARE = [
     #'django.middleware.cache.FetchFromCacheMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # after the session middleware, so saving the session does not pin reads
+    'lenextra.db.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -137,6 +140,11 @@ STATIC_URL = 'static/'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Partial chunked uploads, outside MEDIA_ROOT so they are never served.
+CHUNKED_UPLOAD_DIR = BASE_DIR / 'uploads_partial'
+# Files only handed out by views that check access (course packages,
+# score archives), outside MEDIA_ROOT so they are never served directly.
+PRIVATE_MEDIA_ROOT = BASE_DIR / 'private_media'
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -198,6 +206,14 @@ else:
         }
     }
 
+# Optional read replica of `default`, used by lenextra.db.ReplicaRouter.
+DATABASE_REPLICA_URL = os.environ.get("DATABASE_REPLICA_URL", "")
+if DATABASE_REPLICA_URL:
+    DATABASES["replica"] = dj_database_url.parse(DATABASE_REPLICA_URL, conn_max_age=600, ssl_require=False)
+    DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+
+DATABASE_ROUTERS = ["lenextra.db.ReplicaRouter"]
+
 # Coerce NAME to str for non-sqlite backends (fix PosixPath error)
 if DATABASES["default"]["ENGINE"] != "django.db.backends.sqlite3":
     name = DATABASES["default"].get("NAME")
@@ -0,0 +1,15 @@
+"""
+Storage for files that must not be served from MEDIA_URL.
+"""
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+
+private_storage = FileSystemStorage(location=settings.PRIVATE_MEDIA_ROOT, base_url=None)
+
+
+def get_private_storage():
+    """
+    Storage outside MEDIA_ROOT, for files that views stream after checking
+    access. A callable, so migrations do not record the local path.
+    """
+    return private_storage
@@ -5,6 +5,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from courses.models import Course
+from courses.services.enrollment import is_enrolled
 from live_classes.models import LiveClassRequest, LiveClassSession
 from .serializers import (
     LiveClassRequestCreateSerializer,
@@ -18,10 +19,7 @@ from live_classes.services.scheduler import find_available_tutor
 User = get_user_model()
 
 def user_enrolled_in_course(user, course: Course) -> bool:
-    try:
-        return hasattr(course, "students") and course.students.filter(id=user.id).exists()
-    except Exception:
-        return False
+    return is_enrolled(user, course)
 
 class CreateLiveClassRequestAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -1,13 +1,11 @@
 from django.contrib.auth.decorators import login_required
 from django.http import HttpResponseForbidden, HttpResponseBadRequest, HttpResponseRedirect
 from django.shortcuts import get_object_or_404
+from courses.services.enrollment import is_enrolled
 from .models import LiveClassSession
 
 def _user_enrolled(user, course) -> bool:
-    try:
-        return hasattr(course, "students") and course.students.filter(id=user.id).exists()
-    except Exception:
-        return False
+    return is_enrolled(user, course)
 
 @login_required
 def join_session(request, pk: int):
@@ -5,3 +5,6 @@ class OrganizationsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "organizations"
     label = "organizations"
+
+    def ready(self):
+        from . import signals  # noqa: F401
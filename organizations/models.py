@@ -3,6 +3,8 @@ from django.conf import settings
 from django.utils.text import slugify
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from lenextra import derivatives
+
 
 class TimeStampedModel(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
@@ -33,6 +35,8 @@ class StudentProfile(TimeStampedModel):
         validators=[MinValueValidator(0), MaxValueValidator(4)]
     )
     avatar = models.ImageField(upload_to="students/avatars/", blank=True, null=True)
+    # Resized variants of the avatar, written by a background job after upload
+    avatar_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     enrollment_year = models.PositiveIntegerField(
         blank=True, null=True, validators=[MinValueValidator(1900), MaxValueValidator(2100)]
     )
@@ -40,6 +44,11 @@ class StudentProfile(TimeStampedModel):
     def __str__(self):
         return self.user.get_full_name() or self.user.get_username()
 
+    def avatar_srcsets(self):
+        if not self.avatar:
+            return {}
+        return derivatives.srcsets(self.avatar_derivatives, self.avatar.url)
+
 
 class IndustryTag(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -0,0 +1,44 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from lenextra import derivatives
+from lenextra.background import run_in_background
+
+from .models import StudentProfile
+
+
+@receiver(pre_save, sender=StudentProfile)
+def remember_avatar(sender, instance: StudentProfile, **kwargs):
+    instance._previous_avatar = None
+    if instance.pk:
+        instance._previous_avatar = (
+            StudentProfile.objects.filter(pk=instance.pk)
+            .values_list("avatar", flat=True)
+            .first()
+        )
+    if instance.avatar.name != instance._previous_avatar:
+        # the variants describe the previous picture until the job rebuilds them
+        instance.avatar_derivatives = {}
+
+
+@receiver(post_save, sender=StudentProfile)
+def schedule_avatar_derivatives(sender, instance: StudentProfile, **kwargs):
+    if instance.avatar and instance.avatar.name != getattr(instance, "_previous_avatar", None):
+        run_in_background(
+            derivatives.build, StudentProfile, instance.pk, "avatar", "avatar_derivatives"
+        )
+
+
+@receiver(post_save, sender=StudentProfile)
+def delete_replaced_avatar_derivatives(sender, instance: StudentProfile, **kwargs):
+    previous = getattr(instance, "_previous_avatar", None)
+    if previous and previous != instance.avatar.name:
+        transaction.on_commit(lambda: derivatives.delete(previous))
+
+
+@receiver(post_delete, sender=StudentProfile)
+def delete_avatar_derivatives(sender, instance: StudentProfile, **kwargs):
+    if instance.avatar:
+        name = instance.avatar.name
+        transaction.on_commit(lambda: derivatives.delete(name))
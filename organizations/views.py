@@ -5,6 +5,8 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 from django.db import transaction
 
+from lenextra.db import replica_reads
+
 from .models import (
     University, College, StudentProfile,
     OrganizationTask, TaskApplication, TaskSubmission, StudentAchievement,
@@ -92,6 +94,7 @@ def student_profile_edit(request):
     return render(request, "organizations/student_profile_form.html", {"form": form})
 
 # Public tasks list and apply
+@replica_reads
 def tasks_public_list(request):
     tasks = OrganizationTask.objects.filter(is_active=True, status="open").select_related("business")
     return render(request, "organizations/tasks_public_list.html", {"tasks": tasks})
@@ -13,6 +13,7 @@ from rest_framework.views import APIView
 from paynow import Paynow
 
 from courses.models import Course
+from courses.services.enrollment import is_enrolled
 from payments.models import Payment
 from payments.serializers import CheckoutRequestSerializer, PaymentSerializer
 import stripe  # add
@@ -124,11 +125,7 @@ class PaymentStatusAPIView(APIView):
     def get(self, request, pk: int):
         payment = get_object_or_404(Payment, pk=pk, user=request.user)
         state = _poll_and_update(payment) if payment.status != "paid" else "paid"
-        enrolled = False
-        try:
-            enrolled = hasattr(payment.course, "students") and payment.course.students.filter(id=request.user.id).exists()
-        except Exception:
-            enrolled = False
+        enrolled = is_enrolled(request.user, payment.course_id)
         return Response({
             "payment": PaymentSerializer(payment).data,
             "state": state,
@@ -1,5 +1,4 @@
 from django.urls import path
-from django.views.decorators.cache import cache_page
 
 from . import views
 
@@ -20,13 +19,13 @@ urlpatterns = [
         name='student_course_list',
     ),
     path(
-        'course/<pk>/',
-        cache_page(60 * 15)(views.StudentCourseDetailView.as_view()),
+        'course/<int:pk>/',
+        views.StudentCourseDetailView.as_view(),
         name='student_course_detail',
     ),
     path(
-        'course/<pk>/<module_id>/',
-        cache_page(60 * 15)(views.StudentCourseDetailView.as_view()),
+        'course/<int:pk>/<int:module_id>/',
+        views.StudentCourseDetailView.as_view(),
         name='student_course_detail_module',
     ),
 ]
\ No newline at end of file
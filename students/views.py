@@ -1,21 +1,67 @@
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import Http404
 from django.shortcuts import render, redirect
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
 from django.contrib.auth import authenticate, login
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.views import redirect_to_login
 from django.urls import reverse_lazy, reverse
-from django.views.generic.detail import DetailView
+from django.views.generic.base import TemplateResponseMixin, View
 from django.views.generic.edit import CreateView, FormView
 from django.views.generic.list import ListView
 
 from .forms import CourseEnrollForm
-from courses.models import Course  # FIX: import Course from courses app
+from courses.models import Content, Course  # FIX: import Course from courses app
+from courses.services import catalog, fragments
+from courses.services.enrollment import ais_enrolled, enrolled_course_ids
+from courses.services.versions import aget_version
+from lenextra.db import use_primary
+
+MODULE_BODY_TIMEOUT = 60 * 15
 
 class CourseAccessRequiredMixin(LoginRequiredMixin):  # MOVE: define before use
-    def dispatch(self, request, *args, **kwargs):
-        course = self.get_object()
-        if request.user.is_staff or course.students.filter(id=request.user.id).exists():
-            return super().dispatch(request, *args, **kwargs)
-        return redirect(reverse("payments:checkout_course", args=[course.pk]))
+    """
+    Async views only: resolves the user with `request.auser()`, so the
+    session lookup does not block the event loop.
+    """
+    async def dispatch(self, request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(
+                request.get_full_path(),
+                self.get_login_url(),
+                self.get_redirect_field_name(),
+            )
+        course_id = kwargs['pk']
+        if user.is_staff or await ais_enrolled(user, course_id):
+            return await super(LoginRequiredMixin, self).dispatch(request, *args, **kwargs)
+        return redirect(reverse("payments:checkout_course", args=[course_id]))
+
+
+def _build_module_body(module_id):
+    with use_primary():
+        contents = list(Content.objects.filter(module_id=module_id).with_items())
+    fragments.prime([content.item for content in contents])
+    return render_to_string(
+        'students/course/module_body.html', {'contents': contents}
+    )
+
+
+async def arender_module_body(module_id):
+    """
+    Rendered contents of a module, shared by every student of the course.
+    Only a cache miss leaves the event loop, to load and render the items.
+    """
+    key = f"student_module_body:{module_id}:{await aget_version('module', module_id)}"
+    body = await cache.aget(key)
+    if body is None:
+        body = await sync_to_async(_build_module_body)(module_id)
+        await cache.aset(key, body, MODULE_BODY_TIMEOUT)
+    return mark_safe(body)
+
 
 class StudentRegistrationView(CreateView):
     template_name = 'students/student/registration.html'
@@ -49,26 +95,28 @@ class StudentCourseListView(LoginRequiredMixin, ListView):
 
     def get_queryset(self):
         qs = super().get_queryset()
-        return qs.filter(students__in=[self.request.user])
+        return qs.filter(pk__in=enrolled_course_ids(self.request.user))
     
-class StudentCourseDetailView(CourseAccessRequiredMixin, DetailView):
-    model = Course
+class StudentCourseDetailView(CourseAccessRequiredMixin, TemplateResponseMixin, View):
     template_name = 'students/course/detail.html'
 
-    def get_queryset(self):
-        qs = super().get_queryset()
-        return qs.filter(students__in=[self.request.user])
-
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        # get course object
-        course = self.get_object()
-        if 'module_id' in self.kwargs:
+    async def get(self, request, pk, module_id=None):
+        course = await catalog.acourse_outline(pk)
+        if course is None:
+            raise Http404('No course matches the given query.')
+        modules = course['modules']
+        if module_id is not None:
             # get current module
-            context['module'] = course.modules.get(
-                id=self.kwargs['module_id']
-            )
+            module = next((m for m in modules if m['id'] == module_id), None)
+            if module is None:
+                raise Http404('No module matches the given query.')
         else:
             # get first module
-            context['module'] = course.modules.all()[0]
-        return context
\ No newline at end of file
+            module = modules[0] if modules else None
+        return self.render_to_response(
+            {
+                'object': course,
+                'module': module,
+                'module_body': await arender_module_body(module['id']) if module else '',
+            }
+        )